@@ -0,0 +1,84 @@
+"""Generators for realistically shaped store data used by the benchmarks.
+
+All generators are seeded, so the same arguments always produce the same data."""
+
+from __future__ import annotations
+
+import random
+from string import ascii_lowercase
+from typing import Any
+
+FIRST_USER_ID = 200000000000000000
+CATEGORIES = ["Geschichte", "Geographie", "Wissenschaft", "Sport", "Musik", "Film", "Mövius"]
+
+
+def user_id(index: int) -> str:
+    return str(FIRST_USER_ID + index * 7919)
+
+
+def faith_store(users: int, seed: int = 0) -> dict[str, int]:
+    rng = random.Random(seed)  # noqa: S311
+    return {user_id(i): rng.randint(-50, 50_000) for i in range(users)}
+
+
+def poll_store(polls: int, voters: int = 50, choices: int = 5, seed: int = 0) -> dict[str, Any]:
+    rng = random.Random(seed)  # noqa: S311
+    choice_ids = ascii_lowercase[:choices]
+
+    return {
+        str(poll_id): {
+            "title": f"Umfrage {poll_id}",
+            "description": "Was sollen wir am Wochenende spielen, Krah Krah?",
+            "choices": {choice: f"Antwort {choice.upper()}" for choice in choice_ids},
+            "votes": {
+                user_id(voter): rng.sample(choice_ids, rng.randint(1, 2)) for voter in range(rng.randint(0, voters))
+            },
+            "message_id": str(900000000000000000 + poll_id),
+        }
+        for poll_id in range(polls)
+    }
+
+
+def ranking_store(players: int, seed: int = 0) -> dict[str, Any]:
+    rng = random.Random(seed)  # noqa: S311
+    return {
+        user_id(i): {"name": f"Spieler {i}", "points": rng.randint(0, 3_000_000), "tries": rng.randint(1, 300)}
+        for i in range(players)
+    }
+
+
+def quiz_data(questions: int, stages: list[int] | None = None, seed: int = 0) -> list[dict[str, Any]]:
+    rng = random.Random(seed)  # noqa: S311
+    stages = stages or [
+        50,
+        100,
+        200,
+        300,
+        500,
+        1000,
+        2000,
+        4000,
+        8000,
+        16000,
+        32000,
+        64000,
+        125000,
+        250000,
+        500000,
+        1000000,
+    ]
+
+    output = []
+    for i in range(questions):
+        low = rng.randrange(len(stages))
+        high = min(len(stages) - 1, low + rng.randint(0, 4))
+        output.append(
+            {
+                "question": f"Frage Nummer {i}: Wie heißt der Krächzer mit Vornamen?",
+                "category": rng.choice(CATEGORIES),
+                "range": [stages[low], stages[high]],
+                "answers": [{"text": f"Antwort {j}", "correct": j == 0} for j in range(4)],
+            }
+        )
+
+    return output
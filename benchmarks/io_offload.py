@@ -0,0 +1,120 @@
+"""Compares blocking file reads with reads offloaded to the I/O thread pool.
+
+For every file size, the read is timed and a ticker coroutine measures how long the event
+loop was stalled meanwhile. The stall is what delays the gateway heartbeat.
+
+Usage:
+    python -m benchmarks.io_offload [--sizes 1 4 16]"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from tools.json_tools import async_load_file, load_file
+from tools.textfile_tools import _read_lines, lines_from_textfile
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+TICK = 0.001
+
+
+async def ticker(stop: asyncio.Event) -> float:
+    """Sleeps in short ticks and returns the longest delay beyond the expected tick."""
+
+    max_stall = 0.0
+
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        max_stall = max(max_stall, time.perf_counter() - start - TICK)
+
+    return max_stall
+
+
+async def measure(read: Callable[[], object]) -> tuple[float, float]:
+    """Runs a read while the ticker is active. Returns read duration and max loop stall."""
+
+    stop = asyncio.Event()
+    tick_task = asyncio.create_task(ticker(stop))
+    await asyncio.sleep(TICK)
+
+    start = time.perf_counter()
+    result = read()
+    if asyncio.iscoroutine(result):
+        await result
+    duration = time.perf_counter() - start
+
+    stop.set()
+    return duration, await tick_task
+
+
+def write_fixtures(directory: Path, size_mb: int) -> tuple[str, str]:
+    """Writes a JSON-file and a text-file of roughly the given size."""
+
+    entries = size_mb * 1024 * 1024 // 64
+    json_path = directory / f"store_{size_mb}.json"
+    text_path = directory / f"messages_{size_mb}.txt"
+
+    json_path.write_text(
+        json.dumps({str(100000000000000000 + i): {"name": f"user{i}", "points": i} for i in range(entries)}, indent=4),
+        encoding="utf-8",
+    )
+    text_path.write_text(
+        "\n".join(f"Nachricht Nummer {i}, Krah Krah! Ein bisschen Text." for i in range(entries)),
+        encoding="utf-8",
+    )
+
+    return str(json_path), str(text_path)
+
+
+async def run(sizes: list[int]) -> list[dict[str, object]]:
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size_mb in sizes:
+            json_path, text_path = write_fixtures(Path(tmp_dir), size_mb)
+
+            cases = {
+                "json sync": lambda path=json_path: load_file(path),
+                "json offloaded": lambda path=json_path: async_load_file(path),
+                "text sync": lambda path=text_path: _read_lines(path, "utf-8"),
+                "text offloaded": lambda path=text_path: lines_from_textfile(path),
+            }
+
+            for case, read in cases.items():
+                duration, stall = await measure(read)
+                results.append({"size_mb": size_mb, "case": case, "duration_s": duration, "max_stall_s": stall})
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 4, 16], help="File sizes in MB.")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.sizes))
+
+    if args.json:
+        sys.stdout.write(json.dumps(results, indent=4) + "\n")
+        return
+
+    sys.stdout.write(f"{'size':>6}  {'case':<16}{'read':>10}{'max stall':>12}\n")
+    for result in results:
+        sys.stdout.write(
+            f"{result['size_mb']:>4}MB  {result['case']:<16}"
+            f"{result['duration_s'] * 1000:>8.1f}ms{result['max_stall_s'] * 1000:>10.1f}ms\n"
+        )
+
+
+if __name__ == "__main__":
+    main()
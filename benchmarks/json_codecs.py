@@ -0,0 +1,89 @@
+"""Compares load and save times and file sizes of the available JSON codecs.
+
+Every codec saves and loads generated stores of realistic shape, once pretty printed and
+once compact, and loads them a second time with their schema from the schema_tools.
+
+Usage:
+    python -m benchmarks.json_codecs [--scale 1.0] [--json]"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+from benchmarks import fixtures
+from tools import json_tools
+from tools.schema_tools import FaithStore, PollStore, QuizData, RankingStore
+
+
+def stores(scale: float) -> dict[str, tuple[Any, Any]]:
+    return {
+        "faith": (fixtures.faith_store(int(100_000 * scale)), FaithStore),
+        "polls": (fixtures.poll_store(int(2_000 * scale)), PollStore),
+        "quiz_ranking": (fixtures.ranking_store(int(10_000 * scale)), RankingStore),
+        "quiz": (fixtures.quiz_data(int(20_000 * scale)), QuizData),
+    }
+
+
+def timed(func: Any, *args: Any) -> float:  # noqa: ANN401
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def run(scale: float) -> list[dict[str, Any]]:
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for store_name, (content, schema) in stores(scale).items():
+            for codec in json_tools.available_codecs().values():
+                json_tools.CODEC = codec
+
+                for indent in (4, None):
+                    path = str(Path(tmp_dir) / f"{store_name}.json")
+
+                    results.append(
+                        {
+                            "store": store_name,
+                            "codec": codec.name,
+                            "compact": indent is None,
+                            "save_s": timed(json_tools.save_file, path, content, indent),
+                            "load_s": timed(json_tools.load_file, path),
+                            "typed_load_s": timed(
+                                lambda path=path, schema=schema: json_tools.load_file(path, schema=schema)
+                            ),
+                            "size_bytes": Path(path).stat().st_size,
+                        }
+                    )
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplies the size of the generated stores.")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    args = parser.parse_args()
+
+    results = run(args.scale)
+
+    if args.json:
+        sys.stdout.write(json.dumps(results, indent=4) + "\n")
+        return
+
+    sys.stdout.write(f"{'store':<14}{'codec':<9}{'compact':<9}{'save':>10}{'load':>10}{'typed':>10}{'size':>12}\n")
+    for result in results:
+        sys.stdout.write(
+            f"{result['store']:<14}{result['codec']:<9}{result['compact']!s:<9}"
+            f"{result['save_s'] * 1000:>8.1f}ms{result['load_s'] * 1000:>8.1f}ms"
+            f"{result['typed_load_s'] * 1000:>8.1f}ms{result['size_bytes'] / 1024:>10.0f}KB\n"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""Measures how the persistence backends behave with realistically sized stores.
+
+For every store and size, each backend loads the store, applies single-key updates one by
+one and a batch of updates within one transaction. The write-behind modes only write when
+they are flushed, so the flush after the single updates is timed as well and the amortised
+cost per update includes it. The backends are the plain DictFile,
+its compact, write-behind and journal modes and the SQLiteDictFile. Faith is also measured
+with the Ledger it uses in the bot. The ledger appends every update right away, its flush
+is a checkpoint and its batch is a single add_many. Load times are measured without
+tracemalloc, the peak memory of loading is measured in a second run.
+
+The results can be printed as JSON together with the current commit, so runs of different
+commits can be compared.
+
+Usage:
+    python -m benchmarks.persistence [--faith-users 10000 100000] [--polls 2000]
+        [--players 10000] [--updates 100] [--bulk 1000] [--backends json sqlite ...] [--json]"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from benchmarks import fixtures
+from tools import json_tools
+from tools.json_tools import DictFile, save_file
+from tools.ledger_tools import Ledger
+from tools.sqlite_tools import SQLiteDictFile, close_connections
+
+BACKENDS: dict[str, dict[str, Any] | None] = {
+    "json": {},
+    "json-compact": {"compact": True},
+    "write-behind": {"write_behind": True},
+    "journal": {"journal": True},
+    "journal-write-behind": {"journal": True, "write_behind": True},
+    "sqlite": None,
+    "ledger": None,
+}
+
+LEDGER_STORES = {"faith"}
+
+Store = DictFile | SQLiteDictFile | Ledger
+Update = Callable[[Store, random.Random, int], None]
+
+
+def update_faith(store: Store, rng: random.Random, size: int) -> None:
+    user = fixtures.user_id(rng.randrange(size))
+    store[user] = store[user] + 1
+
+
+def update_faith_ledger(store: Store, rng: random.Random, size: int) -> None:
+    store.add(fixtures.user_id(rng.randrange(size)), 1, "benchmark")  # type: ignore[union-attr]
+
+
+def update_poll(store: Store, rng: random.Random, size: int) -> None:
+    votes = store[str(rng.randrange(size))]["votes"]
+    user = fixtures.user_id(rng.randrange(100))
+
+    if user not in votes:
+        votes[user] = ["a"]
+    elif "a" not in votes[user]:
+        votes[user].append("a")
+    else:
+        votes[user].remove("a")
+
+
+def update_ranking(store: Store, rng: random.Random, size: int) -> None:
+    player = fixtures.user_id(rng.randrange(size))
+    store[player] = store[player] | {"points": store[player]["points"] + 500, "tries": store[player]["tries"] + 1}
+
+
+def stores(args: argparse.Namespace) -> list[tuple[str, dict[str, Any], Update]]:
+    return [
+        *[("faith", fixtures.faith_store(users), update_faith) for users in args.faith_users],
+        *[("polls", fixtures.poll_store(polls), update_poll) for polls in args.polls],
+        *[("quiz_ranking", fixtures.ranking_store(players), update_ranking) for players in args.players],
+    ]
+
+
+def current_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def prepare(backend: str, name: str, content: dict[str, Any], tmp_dir: Path) -> Callable[[], Store]:
+    """Writes the content to fresh files of the backend and returns a function that opens
+    a new instance of the store."""
+
+    if backend == "ledger":
+        path = f"{tmp_dir / backend}/"
+        Path(path).mkdir(exist_ok=True)
+        save_file(f"{path}{name}.json", content)
+        return lambda: Ledger(name, path=path, checkpoint_interval=3600.0, checkpoint_events=sys.maxsize)
+
+    if (options := BACKENDS[backend]) is None:
+        db_path = str(tmp_dir / f"{backend}-{name}.sqlite3")
+        SQLiteDictFile(name, db_path=db_path).update(content)
+        return lambda: SQLiteDictFile(name, db_path=db_path)
+
+    path = f"{tmp_dir / backend}/"
+    Path(path).mkdir(exist_ok=True)
+    save_file(f"{path}{name}.json", content, None if options.get("compact") else 4)
+    return lambda: DictFile(name, path=path, **options)
+
+
+def disk_size(tmp_dir: Path) -> int:
+    return sum(file.stat().st_size for file in tmp_dir.rglob("*") if file.is_file())
+
+
+def flush(store: Store) -> None:
+    if isinstance(store, Ledger):
+        store.checkpoint()
+    else:
+        store.flush()
+
+
+async def measure(  # noqa: PLR0913
+    backend: str,
+    name: str,
+    content: dict[str, Any],
+    update: Update,
+    args: argparse.Namespace,
+    tmp_dir: Path,
+) -> dict[str, Any]:
+    rng = random.Random(0)  # noqa: S311
+    open_store = prepare(backend, name, content, tmp_dir)
+
+    start = time.perf_counter()
+    store = open_store()
+    load_s = time.perf_counter() - start
+
+    tracemalloc.start()
+    open_store()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    if isinstance(store, Ledger):
+        update = update_faith_ledger
+
+    latencies = []
+    for _ in range(args.updates):
+        start = time.perf_counter()
+        update(store, rng, len(content))
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    flush(store)
+    flush_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if isinstance(store, Ledger):
+        store.add_many(((fixtures.user_id(rng.randrange(len(content))), 1) for _ in range(args.bulk)), "benchmark")
+    else:
+        async with store.transaction():
+            for _ in range(args.bulk):
+                update(store, rng, len(content))
+    flush(store)
+    bulk_s = time.perf_counter() - start
+
+    return {
+        "store": name,
+        "size": len(content),
+        "backend": backend,
+        "load_s": load_s,
+        "peak_memory_bytes": peak_memory,
+        "update_mean_ms": statistics.fmean(latencies) * 1000,
+        "update_p50_ms": statistics.median(latencies) * 1000,
+        "update_max_ms": max(latencies) * 1000,
+        "flush_ms": flush_s * 1000,
+        "update_amortised_ms": (sum(latencies) + flush_s) / len(latencies) * 1000,
+        "bulk_ops_per_s": args.bulk / bulk_s,
+        "disk_bytes": disk_size(tmp_dir),
+    }
+
+
+async def run(args: argparse.Namespace) -> list[dict[str, Any]]:
+    results = []
+
+    for name, content, update in stores(args):
+        for backend in args.backends:
+            if backend == "ledger" and name not in LEDGER_STORES:
+                continue
+
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                results.append(await measure(backend, name, content, update, args, Path(tmp_dir)))
+                close_connections()
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--faith-users", type=int, nargs="*", default=[10_000, 100_000], help="Sizes of faith.")
+    parser.add_argument("--polls", type=int, nargs="*", default=[2_000], help="Sizes of the poll store.")
+    parser.add_argument("--players", type=int, nargs="*", default=[10_000], help="Sizes of the quiz ranking.")
+    parser.add_argument("--updates", type=int, default=100, help="Number of timed single-key updates.")
+    parser.add_argument("--bulk", type=int, default=1_000, help="Number of updates within one transaction.")
+    parser.add_argument("--backends", nargs="*", choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    if args.json:
+        output = {
+            "commit": current_commit(),
+            "python": platform.python_version(),
+            "codec": json_tools.CODEC.name,
+            "results": results,
+        }
+        sys.stdout.write(json.dumps(output, indent=4) + "\n")
+        return
+
+    sys.stdout.write(
+        f"{'store':<14}{'size':>9} {'backend':<22}{'load':>10}{'peak mem':>12}"
+        f"{'update':>10}{'max':>10}{'flush':>10}{'amortised':>11}{'bulk':>12}{'disk':>11}\n"
+    )
+    for result in results:
+        sys.stdout.write(
+            f"{result['store']:<14}{result['size']:>9} {result['backend']:<22}"
+            f"{result['load_s'] * 1000:>8.1f}ms{result['peak_memory_bytes'] / 1024:>10.0f}KB"
+            f"{result['update_p50_ms']:>8.3f}ms{result['update_max_ms']:>8.1f}ms"
+            f"{result['flush_ms']:>8.3f}ms{result['update_amortised_ms']:>9.3f}ms"
+            f"{result['bulk_ops_per_s']:>8.0f}op/s{result['disk_bytes'] / 1024:>9.0f}KB\n"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""Plays simulated quiz games against the Quiz cog without connecting to Discord.
+
+The games are played by fake members in fake channels, one game per channel at a time.
+Each member answers according to a strategy. The simulation measures how long selecting a
+question and handling an answer in on_message take and how the games spread over the
+stages. Stages without questions and games that failed are reported, in that case the exit
+code is 1, so the simulation can be run before a deploy.
+
+Without --quiz, json/quiz.json is used and, if it doesn't exist, generated questions.
+
+Usage:
+    python -m benchmarks.quiz_simulation [--games 2000] [--channels 10] [--quiz json/quiz.json]
+        [--strategy accuracy] [--accuracy 0.8] [--quit-stage 10] [--seed 0] [--json]"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from collections.abc import Callable
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from benchmarks import fixtures
+from cogs.quiz import Quiz, QuizError
+from tools.json_tools import flush_dict_files, save_file
+from tools.quiz_tools import STAGES, QuizDataset, QuizSessions
+
+if TYPE_CHECKING:
+    from tools.quiz_tools import QuizSession
+
+Strategy = Callable[["QuizSession", random.Random, argparse.Namespace], str]
+
+
+class FakeMember:
+    def __init__(self, member_id: int) -> None:
+        self.id = member_id
+        self.display_name = f"Spieler {member_id}"
+
+
+class FakeChannel:
+    """Text channel that only counts the messages sent to it."""
+
+    def __init__(self, channel_id: int) -> None:
+        self.id = channel_id
+        self.sent = 0
+
+    async def send(self, *_args: object, **_kwargs: object) -> None:
+        self.sent += 1
+
+
+class FakeMessage:
+    def __init__(self, channel: FakeChannel, author: FakeMember, content: str) -> None:
+        self.channel = channel
+        self.author = author
+        self.content = content
+
+
+class FakeBot:
+    def __init__(self, channels: int) -> None:
+        self.settings = {"quiz_max_sessions": channels}
+
+
+def correct_letter(session: QuizSession) -> str:
+    return next(letter for letter, answer in session.question["answers"].items() if answer["correct"])
+
+
+def answer_perfect(session: QuizSession, _rng: random.Random, _args: argparse.Namespace) -> str:
+    return correct_letter(session)
+
+
+def answer_random(_session: QuizSession, rng: random.Random, _args: argparse.Namespace) -> str:
+    return rng.choice("ABCD")
+
+
+def answer_accuracy(session: QuizSession, rng: random.Random, args: argparse.Namespace) -> str:
+    """Answers correctly with the given accuracy, otherwise picks a random answer."""
+
+    return correct_letter(session) if rng.random() < args.accuracy else rng.choice("ABCD")
+
+
+def answer_quit(session: QuizSession, _rng: random.Random, args: argparse.Namespace) -> str:
+    """Answers correctly until the quit stage is reached and leaves the game there."""
+
+    return "Q" if session.game_stage >= args.quit_stage else correct_letter(session)
+
+
+STRATEGIES: dict[str, Strategy] = {
+    "perfect": answer_perfect,
+    "random": answer_random,
+    "accuracy": answer_accuracy,
+    "quit": answer_quit,
+}
+
+
+class Stats:
+    def __init__(self) -> None:
+        self.selection: list[float] = []
+        self.messages: list[float] = []
+        self.questions_per_stage: Counter[int] = Counter()
+        self.final_stages: Counter[int] = Counter()
+        self.errors: Counter[str] = Counter()
+
+
+def instrument(cog: Quiz, stats: Stats) -> None:
+    """Wraps the question selection of the cog, so every draw is timed and counted. Draws
+    that fail are counted as errors, the cog ends their game."""
+
+    get_random_question = cog.get_random_question
+
+    async def timed_get_random_question(session: QuizSession) -> None:
+        start = time.perf_counter()
+
+        try:
+            await get_random_question(session)
+        except QuizError as error:
+            stats.errors[f"QuizError: {error}"] += 1
+            raise
+
+        stats.selection.append(time.perf_counter() - start)
+        stats.questions_per_stage[session.game_stage] += 1
+
+    cog.get_random_question = timed_get_random_question  # type: ignore[method-assign]
+
+
+async def play_games(  # noqa: PLR0913
+    cog: Quiz,
+    channel: FakeChannel,
+    games: int,
+    rng: random.Random,
+    args: argparse.Namespace,
+    stats: Stats,
+) -> None:
+    """Plays the given number of games in a channel, one after another."""
+
+    strategy = STRATEGIES[args.strategy]
+
+    for game in range(games):
+        member = FakeMember(channel.id * 1_000_000 + game)
+
+        if (session := cog.sessions.start(member, channel)) is None:  # type: ignore[arg-type]
+            stats.errors["no free session"] += 1
+            continue
+
+        stage = 0
+
+        try:
+            await cog.ask_question(session)
+
+            while cog.sessions.get(channel.id) is session:
+                stage = session.game_stage
+                message = FakeMessage(channel, member, strategy(session, rng, args))
+
+                start = time.perf_counter()
+                await cog.on_message(message)  # type: ignore[arg-type]
+                stats.messages.append(time.perf_counter() - start)
+
+                await asyncio.sleep(0)
+        except (LookupError, TypeError) as error:
+            stats.errors[f"{type(error).__name__}: {error}"] += 1
+            cog.sessions.end(session)
+            continue
+
+        stats.final_stages[stage] += 1
+
+
+def percentile(values: list[float], share: float) -> float:
+    if not values:
+        return 0.0
+
+    return sorted(values)[min(len(values) - 1, int(len(values) * share))]
+
+
+def summary(values: list[float]) -> dict[str, float]:
+    return {
+        "count": len(values),
+        "mean_us": statistics.fmean(values) * 1e6 if values else 0.0,
+        "p50_us": percentile(values, 0.5) * 1e6,
+        "p99_us": percentile(values, 0.99) * 1e6,
+        "max_us": max(values, default=0.0) * 1e6,
+    }
+
+
+async def simulate(args: argparse.Namespace, quiz_path: Path) -> dict[str, Any]:
+    stats = Stats()
+    cog = Quiz(FakeBot(args.channels))  # type: ignore[arg-type]
+    cog.dataset = QuizDataset(str(quiz_path), STAGES)
+    cog.sessions = QuizSessions(args.channels, seed=args.seed)
+    index = await cog.dataset.load()
+    instrument(cog, stats)
+
+    rng = random.Random(args.seed)  # noqa: S311
+    channels = [FakeChannel(channel_id) for channel_id in range(1, args.channels + 1)]
+    games_per_channel = [
+        args.games // args.channels + (channel_id < args.games % args.channels) for channel_id in range(args.channels)
+    ]
+
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            play_games(cog, channel, games, random.Random(rng.getrandbits(64)), args, stats)  # noqa: S311
+            for channel, games in zip(channels, games_per_channel, strict=True)
+        )
+    )
+    duration = time.perf_counter() - start
+    flush_dict_files()
+
+    return {
+        "quiz": str(quiz_path),
+        "questions": index.question_count,
+        "strategy": args.strategy,
+        "games": args.games,
+        "channels": args.channels,
+        "duration_s": duration,
+        "games_per_s": args.games / duration,
+        "messages_per_s": len(stats.messages) / duration,
+        "selection": summary(stats.selection),
+        "on_message": summary(stats.messages),
+        "stages": [
+            {
+                "stage": stage,
+                "bucket": len(bucket),
+                "questions": stats.questions_per_stage[stage_index],
+                "final": stats.final_stages[stage_index],
+            }
+            for stage_index, (stage, bucket) in enumerate(zip(STAGES, index.buckets, strict=True))
+        ],
+        "empty_stages": index.empty_stages,
+        "errors": dict(stats.errors),
+    }
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        quiz_path = Path(args.quiz).resolve()
+
+        if not quiz_path.exists():
+            quiz_path = Path(tmp_dir) / "quiz.json"
+            save_file(str(quiz_path), fixtures.quiz_data(args.questions, seed=args.seed))
+
+        # The ranking of the simulated games ends up in the temporary directory.
+        with contextlib.chdir(tmp_dir):
+            result = await simulate(args, quiz_path)
+
+        if quiz_path.is_relative_to(tmp_dir):
+            result["quiz"] = f"generated ({args.questions} questions)"
+
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=2_000, help="Number of games.")
+    parser.add_argument("--channels", type=int, default=10, help="Number of games played in parallel.")
+    parser.add_argument("--quiz", default="json/quiz.json", help="Quiz file to play with.")
+    parser.add_argument("--questions", type=int, default=5_000, help="Generated questions, if there is no quiz file.")
+    parser.add_argument("--strategy", choices=list(STRATEGIES), default="accuracy")
+    parser.add_argument("--accuracy", type=float, default=0.8, help="Share of correct answers for accuracy.")
+    parser.add_argument("--quit-stage", type=int, default=10, help="Stage at which quit leaves the game.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    failed = bool(result["empty_stages"] or result["errors"])
+
+    if args.json:
+        sys.stdout.write(json.dumps(result, indent=4) + "\n")
+        sys.exit(failed)
+
+    sys.stdout.write(
+        f"{result['games']} games ({result['strategy']}) in {result['channels']} channels with "
+        f"{result['questions']} questions from {result['quiz']}\n"
+        f"{result['duration_s']:.2f}s, {result['games_per_s']:.0f} games/s, "
+        f"{result['messages_per_s']:.0f} messages/s\n\n"
+    )
+
+    sys.stdout.write(f"{'':<12}{'count':>9}{'mean':>10}{'p50':>10}{'p99':>10}{'max':>10}\n")
+    for name in ("selection", "on_message"):
+        timing = result[name]
+        sys.stdout.write(
+            f"{name:<12}{timing['count']:>9}{timing['mean_us']:>8.1f}us{timing['p50_us']:>8.1f}us"
+            f"{timing['p99_us']:>8.1f}us{timing['max_us']:>8.1f}us\n"
+        )
+
+    sys.stdout.write(f"\n{'stage':>9}{'bucket':>9}{'asked':>9}{'ended':>9}\n")
+    for stage in result["stages"]:
+        sys.stdout.write(f"{stage['stage']:>9}{stage['bucket']:>9}{stage['questions']:>9}{stage['final']:>9}\n")
+
+    if result["empty_stages"]:
+        sys.stdout.write(f"\nStages without questions: {', '.join(map(str, result['empty_stages']))}\n")
+
+    if result["errors"]:
+        sys.stdout.write("\n")
+
+    for error, count in result["errors"].items():
+        sys.stdout.write(f"{count}x {error}\n")
+
+    sys.exit(failed)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,17 @@
 """This module contains the bot class that inherits from discord's default bot."""
 
 import logging
+from collections.abc import Awaitable, Callable
 
 import discord
 from discord.ext import commands
 
-from tools.json_tools import DictFile
+from tools.json_tools import flush_dict_files, get_dict_file
+from tools.name_tools import NameResolver
+from tools.schema_tools import SettingsFile, SquadStore
+from tools.sqlite_tools import close_connections
+
+ComponentHandler = Callable[[discord.Interaction, str], Awaitable[None]]
 
 
 class Bot(commands.Bot):
@@ -17,14 +23,73 @@ class Bot(commands.Bot):
         super().__init__(("!", "?"), intents=discord.Intents.all())
 
         self.load_files_into_attrs()
+        self.component_handlers: dict[str, ComponentHandler] = {}
+        self.names = NameResolver(self)
 
         logging.info("Bot initialized!")
 
+    async def close(self) -> None:
+        """Closes the bot and writes all pending changes of the DictFiles to disk."""
+
+        await super().close()
+
+        logging.info("Name cache: %s hits, %s misses.", self.names.hits, self.names.misses)
+        flush_dict_files()
+        close_connections()
+        logging.info("Pending DictFile changes flushed.")
+
+    def add_component_handler(self, namespace: str, handler: ComponentHandler) -> None:
+        """Routes all component interactions whose custom_id starts with the given namespace,
+        e.g. 'moevius:poll', to the handler. The handler receives the rest of the custom_id
+        after the namespace."""
+
+        if namespace in self.component_handlers:
+            logging.warning("Component handler for %s replaced.", namespace)
+
+        self.component_handlers[namespace] = handler
+        logging.debug("Component handler for %s added.", namespace)
+
+    def remove_component_handler(self, namespace: str) -> None:
+        """Stops routing component interactions of the given namespace."""
+
+        self.component_handlers.pop(namespace, None)
+        logging.debug("Component handler for %s removed.", namespace)
+
+    async def on_interaction(self, interaction: discord.Interaction) -> None:
+        """Dispatches component interactions to the handler of their namespace. The namespace
+        consists of the first two parts of the custom_id, so the lookup is a single dict access.
+        Interactions of unknown namespaces are left untouched."""
+
+        if interaction.type != discord.InteractionType.component or interaction.data is None:
+            return
+
+        custom_id: str = interaction.data.get("custom_id", "")
+        prefix, _, rest = custom_id.partition(":")
+        name, _, payload = rest.partition(":")
+
+        if (handler := self.component_handlers.get(f"{prefix}:{name}")) is None:
+            logging.debug("No component handler for %s.", custom_id)
+            return
+
+        await handler(interaction, payload)
+
+    async def on_member_update(self, before: discord.Member, after: discord.Member) -> None:
+        """Drops the cached name of a member whose nickname changed."""
+
+        if before.display_name != after.display_name:
+            self.names.invalidate(after.id)
+
+    async def on_user_update(self, before: discord.User, after: discord.User) -> None:
+        """Drops the cached name of a user whose name changed."""
+
+        if before.display_name != after.display_name:
+            self.names.invalidate(after.id)
+
     def load_files_into_attrs(self) -> None:
         """This function fills the bot's attributes with data from files."""
 
-        self.settings = DictFile("settings")
-        self.squads = DictFile("squads")
+        self.settings = get_dict_file("settings", schema=SettingsFile)
+        self.squads = get_dict_file("squads", schema=SquadStore)
         self.channels: dict[str, discord.TextChannel | None] = {}
 
     async def analyze_guild(self) -> None:
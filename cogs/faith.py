@@ -2,14 +2,19 @@
 
 from __future__ import annotations
 
+import datetime as dt
 import logging
 from typing import TYPE_CHECKING
 
 import discord
 from discord.ext import commands
 
+from tools.cache_tools import LRUCache
 from tools.check_tools import is_super_user
-from tools.json_tools import DictFile
+from tools.dt_tools import get_local_timezone
+from tools.io_tools import run_io
+from tools.ledger_tools import Ledger
+from tools.schema_tools import FaithStore
 
 if TYPE_CHECKING:
     from bot import Bot
@@ -17,8 +22,15 @@ if TYPE_CHECKING:
 default_fields = {
     "member": commands.parameter(description="Server Mitglied. Möglicher Input: ID, Mention, Name."),
     "points": commands.parameter(description="Menge an 🕊️-Punkten als ganze Zahl."),
+    "optional_member": commands.parameter(default=None, description="Server Mitglied. Ohne Angabe du selbst."),
+    "page": commands.parameter(default=1, description="Seitenzahl."),
 }
 
+FAITH_CHECKPOINT_INTERVAL = 300.0
+FAITH_CHECKPOINT_EVENTS = 1000
+FAITH_HISTORY_LENGTH = 10
+MESSAGE_AUTHOR_CACHE_SIZE = 50_000
+
 
 async def setup(bot: Bot) -> None:
     """Setup function for the cog"""
@@ -31,17 +43,46 @@ class Faith(commands.Cog, name="Faith"):
 
     def __init__(self, bot: Bot) -> None:
         self.bot = bot
-        self.faith = DictFile("faith")
+        self.faith = Ledger(
+            "faith",
+            checkpoint_interval=FAITH_CHECKPOINT_INTERVAL,
+            checkpoint_events=FAITH_CHECKPOINT_EVENTS,
+            schema=FaithStore,
+        )
+        self.message_authors: LRUCache[int, int] = LRUCache("message authors", MESSAGE_AUTHOR_CACHE_SIZE)
+
+    async def cog_load(self) -> None:
+        for message in self.bot.cached_messages:
+            self.message_authors.put(message.id, message.author.id)
+
+        logging.debug("Message author cache filled with %s messages.", len(self.message_authors))
 
     async def cog_unload(self) -> None:
+        await self.faith.async_checkpoint()
+        self.message_authors.log_stats()
         logging.info("Cog unloaded: Faith.")
 
-    async def add_faith(self, member: discord.User | discord.Member, amount: int) -> None:
-        """Adds a specified amount of faith points to the specified member"""
+    async def message_author_id(self, channel: discord.TextChannel, message_id: int) -> int | None:
+        """Returns the ID of the author of a message. The message is only fetched, if its
+        author isn't in the cache yet."""
+
+        if (author_id := self.message_authors.get(message_id)) is not None:
+            return author_id
 
-        member_id = str(member.id)
+        try:
+            message = await channel.fetch_message(message_id)
+        except discord.HTTPException:
+            logging.exception("Message %s could not be fetched.", message_id)
+            return None
 
-        self.faith[member_id] = self.faith.get(member_id, 0) + amount
+        self.message_authors.put(message_id, message.author.id)
+
+        return message.author.id
+
+    async def add_faith(self, member: discord.User | discord.Member, amount: int, reason: str) -> None:
+        """Adds a specified amount of faith points to the specified member"""
+
+        self.faith.add(str(member.id), amount, reason)
 
         logging.info("Faith added: %s, %s", member.name, amount)
 
@@ -60,18 +101,21 @@ class Faith(commands.Cog, name="Faith"):
         if not isinstance(channel, discord.TextChannel):
             return
 
-        faith_given_to = (await channel.fetch_message(payload.message_id)).author
-        await self.add_faith(faith_given_to, amount)
+        if (author_id := await self.message_author_id(channel, payload.message_id)) is None:
+            return
 
         if (faith_given_by := self.bot.get_user(payload.user_id)) is None:
+            self.faith.add(str(author_id), amount, "reaction")
+            logging.info("Faith added: %s, %s", author_id, amount)
             return
-        await self.add_faith(faith_given_by, 1)
+
+        self.faith.add_many([(str(author_id), amount), (str(faith_given_by.id), 1)], "reaction")
 
         logging.info(
             "Faith on reaction: %s %s %s %s🕊",
             faith_given_by.display_name,
             "takes" if amount <= 1 else "gives",
-            faith_given_to.display_name,
+            faith_given_to.display_name if (faith_given_to := self.bot.get_user(author_id)) else author_id,
             self.bot.settings["faith_on_react"],
         )
 
@@ -82,32 +126,66 @@ class Faith(commands.Cog, name="Faith"):
         if ctx.invoked_subcommand is not None:
             return
 
-        members = {
-            member.display_name: amount
-            for user, amount in sorted(self.faith.items(), key=lambda item: item[1], reverse=True)
-            if (member := self.bot.get_user(int(user))) is not None
-        }
+        await self.send_faith_page(ctx, 1)
 
-        output = (
-            "```"
-            + "\n".join([f"{user:30}{amount:>6,d}🕊".replace(",", ".") for user, amount in members.items()])
-            + "```"
-        )
+    async def send_faith_page(self, ctx: commands.Context, page: int) -> None:
+        """Sends a page of the leaderboard of the faith points."""
+
+        leaderboard = self.faith.leaderboard
+        page = min(max(1, page), leaderboard.page_count())
 
-        if not output:
+        entries = leaderboard.page(page)
+        names = self.bot.names.resolve_many(user for _, user, _ in entries)
+
+        lines = [
+            f"{rank:>4}. {name:30}{amount:>8,d}🕊".replace(",", ".")
+            for (rank, _, amount), name in zip(entries, names, strict=True)
+        ]
+
+        if not lines:
             await ctx.send("Nanana, da stimmt etwas, Krah Krah!")
             logging.error("Faith could not be displayed.")
 
             return
 
+        embed = discord.Embed(
+            title="Die treuen Jünger des Mövius und ihre Punkte",
+            colour=discord.Colour(0xFF00FF),
+            description="```" + "\n".join(lines) + "```",
+        )
+        embed.set_footer(text=f"Seite {page}/{leaderboard.page_count()}")
+
+        await ctx.send(embed=embed)
+        logging.info("Faith page %s displayed.", page)
+
+    @_faith.command(name="seite", aliases=["page", "p"], brief="Zeigt eine bestimmte Seite der Jünger an.")
+    async def _faith_page(
+        self,
+        ctx: commands.Context,
+        page: int = default_fields["page"],
+    ) -> None:
+        """Zeigt eine bestimmte Seite der Jünger des Mövius und ihre 🕊 an."""
+
+        await self.send_faith_page(ctx, page)
+
+    @_faith.command(name="rang", aliases=["rank"], brief="Zeigt, auf welchem Platz du stehst.")
+    async def _faith_rank(
+        self,
+        ctx: commands.Context,
+        member: discord.Member | None = default_fields["optional_member"],
+    ) -> None:
+        """Zeigt den Platz und die 🕊 eines Users an. Ohne Angabe deinen eigenen."""
+
+        member = member or ctx.author
+
+        if (rank := self.faith.leaderboard.rank(str(member.id))) is None:
+            await ctx.send(f"{member.display_name} hat noch keine 🕊, Krah Krah!")
+            return
+
+        amount = format(self.faith.get(str(member.id)), ",d").replace(",", ".")
         await ctx.send(
-            embed=discord.Embed(
-                title="Die treuen Jünger des Mövius und ihre Punkte",
-                colour=discord.Colour(0xFF00FF),
-                description=output,
-            )
+            f"{member.display_name} ist auf Platz {rank} von {len(self.faith.leaderboard)} mit {amount}🕊, Krah Krah!"
         )
-        logging.info("Faith displayed.")
 
     @is_super_user()
     @_faith.command(name="add", aliases=["-a", "+"], brief="Gibt einem User 🕊️-Punkte.")
@@ -121,7 +199,7 @@ class Faith(commands.Cog, name="Faith"):
 
         logging.info("Manual faith added by %s", ctx.author.name)
 
-        await self.add_faith(member, amount)
+        await self.add_faith(member, amount, f"add by {ctx.author.name}")
 
         await ctx.send(f"Alles klar, {member.display_name} hat {amount}🕊 erhalten, Krah Krah!")
 
@@ -136,7 +214,7 @@ class Faith(commands.Cog, name="Faith"):
         """Entfernt einem User 🕊️-Punkte."""
 
         logging.info("Manual faith removed by %s", ctx.author.name)
-        await self.add_faith(member, amount * (-1))
+        await self.add_faith(member, amount * (-1), f"remove by {ctx.author.name}")
 
         await ctx.send(f"Alles klar, {member.display_name} wurden {amount}🕊 abgezogen, Krah Krah!")
 
@@ -155,10 +233,34 @@ class Faith(commands.Cog, name="Faith"):
         """Setzt die 🕊️-Punkte eines Users auf einen bestimmten Wert."""
 
         logging.info("Manual faith set by %s", ctx.author.name)
-        self.faith.update({str(member.id): amount})
+        self.faith.set(str(member.id), amount, f"set by {ctx.author.name}")
 
         await ctx.send(f"Alles klar, {member.display_name} hat nun {amount}🕊, Krah Krah!")
 
+    @is_super_user()
+    @_faith.command(name="history", aliases=["-h"], brief="Zeigt die letzten Änderungen der 🕊️-Punkte eines Users.")
+    async def _faith_history(
+        self,
+        ctx: commands.Context,
+        member: discord.Member = default_fields["member"],
+    ) -> None:
+        """Zeigt die letzten Änderungen der 🕊️-Punkte eines Users aus dem Faith-Ledger."""
+
+        events = await run_io(self.faith.history, str(member.id), FAITH_HISTORY_LENGTH)
+
+        if not events:
+            await ctx.send(f"Für {member.display_name} gibt es noch keine Einträge, Krah Krah!")
+            return
+
+        lines = [
+            f"{dt.datetime.fromtimestamp(event['timestamp'], tz=get_local_timezone()):%d.%m.%Y %H:%M} "
+            f"{event['delta']:>+6d}🕊 {event['balance']:>7d}🕊  {event['reason']}"
+            for event in events
+        ]
+
+        await ctx.send(f"Die letzten Änderungen von {member.display_name}:\n```" + "\n".join(lines) + "```")
+        logging.info("Faith history of %s displayed.", member.name)
+
     @commands.Cog.listener()
     async def on_command_completion(self, ctx: commands.Context) -> None:
         """Checks wether the completed command is in the faith_by_command-list
@@ -175,7 +277,12 @@ class Faith(commands.Cog, name="Faith"):
 
         amount: int = self.bot.settings["faith_by_command"][ctx.command.qualified_name]
 
-        await self.add_faith(ctx.author, amount)
+        await self.add_faith(ctx.author, amount, f"command {ctx.command.qualified_name}")
+
+    @commands.Cog.listener()
+    async def on_message(self, message: discord.Message) -> None:
+        """Remembers the author of every new message, so reactions to it don't have to fetch it."""
+        self.message_authors.put(message.id, message.author.id)
 
     @commands.Cog.listener()
     async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent) -> None:
@@ -13,7 +13,7 @@ import discord
 from bs4 import BeautifulSoup
 from discord.ext import commands
 
-from tools.json_tools import DictFile
+from tools.json_tools import get_dict_file
 from tools.request_tools import async_request_html
 from tools.textfile_tools import lines_from_textfile
 
@@ -45,7 +45,7 @@ class Misc(commands.Cog, name="Sonstiges"):
         self.bot = bot
         self.fragen: list[str] = []
         self.bible: list[str] = []
-        self.responses = DictFile("responses")
+        self.responses = get_dict_file("responses")
 
     async def cog_unload(self) -> None:
         logging.info("Cog unloaded: Misc.")
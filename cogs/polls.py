@@ -4,6 +4,7 @@ from __future__ import annotations
 
 import logging
 import re
+import time
 from typing import TYPE_CHECKING
 
 import discord
@@ -12,14 +13,17 @@ from discord.ext import commands
 from tools.check_tools import SpecialUser, is_special_user
 from tools.converter_tools import convert_choices_to_list
 from tools.embed_tools import PollEmbed
-from tools.json_tools import DictFile
-from tools.view_tools import PollView
+from tools.json_tools import DictFile, get_dict_file
+from tools.poll_tools import PollArchive, PollState, PollStates, PollStatus
+from tools.schema_tools import PollStore
+from tools.view_tools import POLL_NAMESPACE, PollView
 
 if TYPE_CHECKING:
     from bot import Bot
 
 
 MIN_CHOICES = 2
+POLL_EDIT_INTERVAL = 1.0
 
 
 async def setup(bot: Bot) -> None:
@@ -29,68 +33,133 @@ async def setup(bot: Bot) -> None:
     logging.info("Cog loaded: Polls.")
 
 
-async def stop_poll(msg: discord.Message, polls: dict, poll_id: str) -> None:
-    """Stops a running poll by deactivating the buttons of the given messsage."""
+def get_polls() -> DictFile:
+    """Returns the shared DictFile of the polls."""
+
+    return get_dict_file("polls", write_behind=True, journal=True, compact=True, schema=PollStore)
 
-    choices = polls[poll_id]["choices"]
-    votes = polls[poll_id]["votes"]
 
-    view = PollView().deactivate_buttons_from_collection(choices, votes)
+async def stop_poll(msg: discord.Message, state: PollState) -> None:
+    """Stops a running poll by deactivating the buttons of the given messsage."""
+
+    view = PollView().deactivate_buttons_from_collection(state.choices, state.vote_counts)
 
     await msg.edit(view=view)
     view.stop()
 
 
+def is_closed_poll_message(msg: discord.Message) -> bool:
+    """Polls that were stopped before they got a state can only be recognized by their
+    message, whose buttons are all deactivated."""
+
+    buttons = [
+        component
+        for row in msg.components
+        if isinstance(row, discord.ActionRow)
+        for component in row.children
+        if isinstance(component, discord.Button)
+    ]
+
+    return bool(buttons) and all(button.disabled for button in buttons)
+
+
 class Polls(commands.Cog, name="Umfragen"):
     """This cog includes commands for building polls"""
 
     def __init__(self, bot: Bot) -> None:
         self.bot = bot
-        self.re_poll_button = re.compile(
-            r"^moevius\:poll\:(?P<poll_id>\d+)\:choice\:(?P<choice>\w)\:iteration:(?P<iteration>\d+)$"
-        )
+        self.re_poll_button = re.compile(r"^(?P<poll_id>\d+)\:choice\:(?P<choice>\w)(?:\:iteration:\d+)?$")
+        self.poll_states = PollStates()
+        self.poll_views: dict[str, PollView] = {}
+        self.archive = PollArchive(get_polls())
+
+    async def cog_load(self) -> None:
+        self.bot.add_component_handler(POLL_NAMESPACE, self.on_legacy_poll_button)
+        self.restore_poll_views()
 
     async def cog_unload(self) -> None:
+        self.bot.remove_component_handler(POLL_NAMESPACE)
+
+        for view in self.poll_views.values():
+            view.stop()
+
+        await self.poll_states.close()
         logging.info("Cog unloaded: Polls.")
 
-    @commands.Cog.listener()
-    async def on_interaction(self, interaction: discord.interactions.Interaction) -> None:
-        """Poll interaction listener. Reacts to interactions that match the custom_id format for polls."""
+    def poll_view(self, state: PollState) -> PollView:
+        """Builds the view with the current vote counts of a poll and remembers it, so it
+        can be stopped later."""
+
+        view = PollView(self.on_poll_button).buttons_from_collection(state.choices, state.vote_counts, state.poll_id)
+        self.poll_views[state.poll_id] = view
+
+        return view
+
+    def restore_poll_views(self) -> None:
+        """Registers the views of the poll messages, so their buttons keep working after a
+        restart. The polls are loaded once and their votes are counted on the way."""
+
+        start = time.perf_counter()
+        polls = get_polls()
+        restored = 0
+
+        for poll_id, poll in polls.items():
+            if "message_id" not in poll:
+                continue
+
+            self.bot.add_view(self.poll_view(self.poll_states.get(polls, poll_id)), message_id=int(poll["message_id"]))
+            restored += 1
+
+        logging.info("Restored %s poll views in %.1f ms.", restored, (time.perf_counter() - start) * 1000)
+
+    async def edit_poll_message(self, state: PollState, message: discord.Message) -> None:
+        """Updates the buttons of a poll message with the current vote counts."""
+
+        try:
+            await message.edit(view=self.poll_view(state))
+        except discord.HTTPException:
+            logging.exception("Message of poll %s could not be edited.", state.poll_id)
+
+    async def on_legacy_poll_button(self, interaction: discord.Interaction, custom_id: str) -> None:
+        """Handles clicks on buttons of poll messages that were sent before the views became
+        persistent. Their custom_id contains an iteration, which can't be restored. The
+        first click replaces the buttons with ones of the persistent view."""
+
+        if ":iteration:" in custom_id:
+            await self.on_poll_button(interaction, custom_id)
+
+    async def on_poll_button(self, interaction: discord.Interaction, custom_id: str) -> None:
+        """Handles clicks on poll buttons. Receives the part of the custom_id after the
+        poll namespace."""
 
-        if interaction is None or interaction.data is None or "custom_id" not in interaction.data:
-            logging.debug("Interaction empty or no custom_id.")
+        if (interaction_match := self.re_poll_button.match(custom_id)) is None:
+            logging.warning("Invalid custom_id for polls: %s", custom_id)
             return
 
         await interaction.response.defer()
 
-        if (interaction_match := self.re_poll_button.match(interaction.data["custom_id"])) is None:
-            logging.debug("Empty regex Match from custom_id. Not relevant for polls.")
-            return
+        poll_id, choice_id = interaction_match.groups()
 
-        poll_id, choice_id, iter_str = interaction_match.groups()
+        if poll_id not in (polls := get_polls()):
+            logging.warning("Poll %s not found.", poll_id)
+            return
 
-        polls = DictFile("polls")
-        votes = polls[poll_id]["votes"]
-        choices = polls[poll_id]["choices"]
-        user_id = str(interaction.user.id)
-        iteration = int(iter_str)
+        state = self.poll_states.get(polls, poll_id)
 
-        if user_id not in votes:
-            votes[user_id] = [choice_id]
-        elif choice_id not in votes[user_id]:
-            votes[user_id].append(choice_id)
-        else:
-            votes[user_id].remove(choice_id)
+        if state.stopped:
+            await interaction.followup.send("Die Umfrage wurde bereits beendet!", ephemeral=True)
+            return
 
-        polls.save()
+        state.toggle_vote(str(interaction.user.id), choice_id)
 
-        if interaction.message is None:
+        if (message := interaction.message) is None:
             logging.error("Message not found in interaction.")
             return
 
-        view = PollView().buttons_from_collection(choices, votes, poll_id, iteration)
-
-        await interaction.followup.edit_message(interaction.message.id, view=view)
+        state.request_edit(
+            lambda: self.edit_poll_message(state, message),
+            self.bot.settings.get("poll_edit_interval", POLL_EDIT_INTERVAL),
+        )
 
         await interaction.followup.send("Stimmabgabe erfolgreich!", ephemeral=True)
 
@@ -124,21 +193,19 @@ class Polls(commands.Cog, name="Umfragen"):
             )
             return
 
-        try:
-            polls = DictFile("polls")
-            new_poll_id = str(max(map(int, polls)) + 1)
-        except ValueError:
-            new_poll_id = "0"
+        polls = get_polls()
+        new_poll_id = self.archive.allocate_id()
 
         new_poll = {
             "title": title,
             "description": description,
             "choices": dict(choices),
             "votes": {},
+            "state": PollStatus.ACTIVE,
         }
 
         embed = PollEmbed(new_poll_id, new_poll)
-        view = PollView().buttons_from_choices(new_poll_id, choices)
+        view = self.poll_views[new_poll_id] = PollView(self.on_poll_button).buttons_from_choices(new_poll_id, choices)
         msg = await ctx.send(
             "Eine neue Umfrage, Krah Krah! Mehrfachauswahl erlaubt. "
             "Klicke um abszutimmen oder um deine Stimme zurückzunehmen.",
@@ -156,7 +223,13 @@ class Polls(commands.Cog, name="Umfragen"):
     async def _poll_stop(self, ctx: commands.Context, poll_id: str) -> None:
         await ctx.defer(ephemeral=True)
 
-        polls = DictFile("polls")
+        polls = get_polls()
+
+        if poll_id in self.archive:
+            polls.pop(poll_id, None)
+            await ctx.send("Die Umfrage wurde bereits beendet!", ephemeral=True)
+            logging.warning("Poll %s already archived!", poll_id)
+            return
 
         if poll_id not in polls:
             await ctx.send("Fehler! Poll ID nicht gefunden!", ephemeral=True)
@@ -168,6 +241,53 @@ class Polls(commands.Cog, name="Umfragen"):
             logging.warning("Message not found!")
             return
 
-        await stop_poll(msg, polls, poll_id)
+        state = self.poll_states.get(polls, poll_id)
+
+        state.stopped = True
+
+        await state.cancel_edits()
+        await stop_poll(msg, state)
+
+        self.archive_poll(polls, poll_id)
 
         await ctx.send("Poll deaktiviert!", ephemeral=True)
+
+    def archive_poll(self, polls: DictFile, poll_id: str) -> None:
+        """Moves a closed poll from the poll file to the archive and drops its view and state."""
+
+        self.archive.add(poll_id, polls[poll_id])
+        del polls[poll_id]
+
+        if (view := self.poll_views.pop(poll_id, None)) is not None:
+            view.stop()
+
+        self.poll_states.discard(poll_id)
+
+    @is_special_user([SpecialUser.SCHNENK, SpecialUser.HANS, SpecialUser.ZUGGI])
+    @_poll.command(name="cleanup")
+    async def _poll_cleanup(self, ctx: commands.Context) -> None:
+        """Archiviert beendete Umfragen aus der Zeit vor dem Archiv. Muss im Kanal der
+        Umfragen aufgerufen werden."""
+
+        await ctx.defer(ephemeral=True)
+
+        polls = get_polls()
+        archived = 0
+
+        for poll_id, poll in list(polls.items()):
+            if "state" in poll or "message_id" not in poll:
+                continue
+
+            try:
+                msg = await ctx.fetch_message(int(poll["message_id"]))
+            except discord.HTTPException:
+                continue
+
+            if not is_closed_poll_message(msg):
+                continue
+
+            self.archive_poll(polls, poll_id)
+            archived += 1
+
+        logging.info("%s closed polls archived by %s.", archived, ctx.author.name)
+        await ctx.send(f"{archived} beendete Umfragen archiviert!", ephemeral=True)
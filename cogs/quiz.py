@@ -3,16 +3,18 @@
 from __future__ import annotations
 
 import logging
-import random
-from enum import Enum
-from pathlib import Path
+import time
+from enum import IntEnum
 from typing import TYPE_CHECKING
 
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 
 from tools.check_tools import is_super_user
-from tools.json_tools import load_file, save_file
+from tools.json_tools import DictFileLoadError
+from tools.quiz_tools import STAGES, QuizDataset, QuizSession, QuizSessions, shuffled_answers
+from tools.ranking_tools import QuizRanking
+from tools.textfile_tools import append_to_textfile
 
 if TYPE_CHECKING:
     from bot import Bot
@@ -24,11 +26,18 @@ async def setup(bot: Bot) -> None:
     logging.info("Cog: Quiz geladen.")
 
 
+QUIZ_MAX_SESSIONS = 10
+QUIZ_IDLE_TIMEOUT = 600.0
+
+
 class QuizError(Exception):
     pass
 
 
-class CheckPoint(Enum):
+class CheckPoint(IntEnum):
+    """Stages of the checkpoints and the win. They are compared to the stage of a game,
+    which is an int."""
+
     FIRST: int = 4
     SECOND: int = 9
     THIRD: int = 15
@@ -40,210 +49,221 @@ class Quiz(commands.Cog, name="Quiz"):
     def __init__(self, bot: Bot) -> None:
         self.bot = bot
 
-        self.player: discord.Member | None = None
-        self.channel: discord.TextChannel | None = None
-        self.game_stage: int = 0
-        self.question: dict[str, dict] = {}
-        self.quiz: list | None = None
-
-        self.stages = [
-            50,
-            100,
-            200,
-            300,
-            500,
-            1000,
-            2000,
-            4000,
-            8000,
-            16000,
-            32000,
-            64000,
-            125000,
-            250000,
-            500000,
-            1000000,
-        ]
+        self.ranking = QuizRanking()
+
+        self.stages = STAGES
+        self.dataset = QuizDataset("json/quiz.json", self.stages)
+        self.sessions = QuizSessions(
+            self.bot.settings.get("quiz_max_sessions", QUIZ_MAX_SESSIONS),
+            self.bot.settings.get("quiz_idle_timeout", QUIZ_IDLE_TIMEOUT),
+        )
 
         logging.debug("Game-Stages geladen.")
 
-    async def get_random_question(self) -> None:
+    async def cog_load(self) -> None:
+        """Loads the quiz questions once, so starting a game doesn't have to load them."""
+
+        try:
+            await self.dataset.load()
+        except (OSError, ValueError, TypeError, DictFileLoadError):
+            logging.exception("Quiz questions couldn't be loaded.")
+
+        self.expire_sessions.start()
+
+    async def cog_unload(self) -> None:
+        self.expire_sessions.cancel()
+        self.ranking.flush()
+
+    @tasks.loop(seconds=60.0)
+    async def expire_sessions(self) -> None:
+        for session in self.sessions.expire():
+            await session.channel.send(
+                f"Das Quiz mit {session.player.display_name} wurde wegen Inaktivität beendet, Krah Krah!"
+            )
+
+    async def get_random_question(self, session: QuizSession) -> None:
         """_summary_"""
 
-        if self.quiz is None:
+        if self.dataset.index is None:
             msg = "Quiz data not found!"
             raise QuizError(msg)
 
-        while True:
-            question = random.SystemRandom().choice(self.quiz)
-
-            if (
-                self.stages[self.game_stage] >= question["range"][0]
-                and self.stages[self.game_stage] <= question["range"][1]
-            ):
-                random.shuffle(question["answers"])
-
-                self.question = {
-                    "question": question["question"],
-                    "category": question["category"],
-                    "answers": dict(zip(["A", "B", "C", "D"], question["answers"], strict=True)),
-                }
+        if (question := session.deck.deal(self.dataset.index, session.game_stage)) is None:
+            msg = f"No question for stage {self.stages[session.game_stage]}!"
+            raise QuizError(msg)
 
-                return
+        session.question = {
+            "question": question.question,
+            "category": question.category,
+            "answers": {
+                letter: {"text": answer.text, "correct": answer.correct}
+                for letter, answer in zip(["A", "B", "C", "D"], shuffled_answers(question, session.rng), strict=True)
+            },
+        }
 
-    async def get_question_output(self) -> dict[str, str | discord.Embed] | None:
+    async def get_question_output(self, session: QuizSession) -> dict[str, str | discord.Embed] | None:
         """_summary_
 
         Returns:
             dict[str, Any]: _description_"""
 
-        if not isinstance(self.question["answers"], dict):
+        if not isinstance(session.question.get("answers"), dict):
             return None
 
         embed = discord.Embed(
-            title=self.question["question"],
+            title=session.question["question"],
             colour=discord.Colour(0xFF00FF),
-            description="\n".join([f"{a[0]}: {a[1]['text']}" for a in self.question["answers"].items()]),
+            description="\n".join([f"{a[0]}: {a[1]['text']}" for a in session.question["answers"].items()]),
         )
         return {
-            "content": f"**Frage {self.game_stage + 1} - "
-            f"{self.stages[self.game_stage]}🕊**\n"
-            f"Kategorie: {self.question['category']}",
+            "content": f"**Frage {session.game_stage + 1} - "
+            f"{self.stages[session.game_stage]}🕊**\n"
+            f"Kategorie: {session.question['category']}",
             "embed": embed,
         }
 
-    async def check_answer(self, user_answer: str) -> None:
-        if self.channel is None or not isinstance(self.question["answers"], dict):
-            return
-
-        if self.question["answers"][user_answer]["correct"]:
-            await self.channel.send("✅ Richtig!\n")
+    async def send_question(self, session: QuizSession) -> None:
+        await self.get_random_question(session)
+        output = await self.get_question_output(session)
 
-            if self.game_stage == CheckPoint.THIRD:
-                await self.channel.send(f"Du hast {self.stages[15]}🕊 gewonnen!!!")
+        if output is None or not (isinstance(output["content"], str) and isinstance(output["embed"], discord.Embed)):
+            return
 
-                await self.update_ranking(self.stages[15])
-                await self.stop_quiz()
+        await session.channel.send(content=output["content"], embed=output["embed"])
 
-                return
+    async def ask_question(self, session: QuizSession) -> None:
+        """Sends the next question. Ends the game, if there is no question for its stage,
+        so the channel isn't blocked by a game that can't go on."""
 
-            if self.game_stage in [CheckPoint.FIRST, CheckPoint.SECOND]:
-                await self.channel.send(f"❗️ Checkpoint erreicht: {self.stages[self.game_stage]}🕊.")
+        try:
+            await self.send_question(session)
+        except QuizError:
+            logging.exception("Quiz in %s ended, no question could be asked.", session.channel.id)
 
-            self.game_stage += 1
+            await self.stop_quiz(session)
+            await session.channel.send(
+                "Für diese Runde gibt es leider keine Frage, das Quiz wird ohne Wertung beendet, Krah Krah!"
+            )
 
-            await self.get_random_question()
-            output = await self.get_question_output()
+    async def check_answer(self, session: QuizSession, user_answer: str) -> None:
+        if not isinstance(session.question.get("answers"), dict):
+            return
 
-            if output is None or not (
-                isinstance(output["content"], str) and isinstance(output["embed"], discord.Embed)
-            ):
-                return
+        channel = session.channel
 
-            await self.channel.send(content=output["content"], embed=output["embed"])
+        if session.question["answers"][user_answer]["correct"]:
+            await channel.send("✅ Richtig!\n")
 
-        else:
-            await self.channel.send("❌ Falsch!")
+            if session.game_stage == CheckPoint.THIRD:
+                await channel.send(f"Du hast {self.stages[15]}🕊 gewonnen!!!")
 
-            correct_answer = next(answer for answer in self.question["answers"].items() if answer[1]["correct"])
+                await self.update_ranking(session, self.stages[15])
+                await self.stop_quiz(session)
 
-            await self.channel.send(f"Die richtige Antwort ist {correct_answer[0]}: {correct_answer[1]['text']}")
+                return
 
-            if self.game_stage <= CheckPoint.FIRST:
-                await self.channel.send("Du verlässt das Spiel ohne Gewinn.")
-                await self.update_ranking(0)
-            elif self.game_stage > CheckPoint.SECOND:
-                await self.channel.send(f"Du verlässt das Spiel mit {self.stages[9]}🕊.")
-                await self.update_ranking(self.stages[9])
-            elif self.game_stage > CheckPoint.FIRST:
-                await self.channel.send(f"Du verlässt das Spiel mit {self.stages[4]}🕊.")
-                await self.update_ranking(self.stages[4])
+            if session.game_stage in [CheckPoint.FIRST, CheckPoint.SECOND]:
+                await channel.send(f"❗️ Checkpoint erreicht: {self.stages[session.game_stage]}🕊.")
 
-            await self.stop_quiz()
+            session.game_stage += 1
 
-    async def stop_quiz(self) -> None:
-        """_summary_"""
+            await self.ask_question(session)
 
-        self.player = None
-        self.channel = None
-        self.game_stage = 0
+        else:
+            await channel.send("❌ Falsch!")
 
-    async def update_ranking(self, amount: int) -> None:
-        """_summary_
+            correct_answer = next(answer for answer in session.question["answers"].items() if answer[1]["correct"])
 
-        Args:
-            amount (int): _description_"""
+            await channel.send(f"Die richtige Antwort ist {correct_answer[0]}: {correct_answer[1]['text']}")
 
-        if self.player is None:
-            return
+            if session.game_stage <= CheckPoint.FIRST:
+                await channel.send("Du verlässt das Spiel ohne Gewinn.")
+                await self.update_ranking(session, 0)
+            elif session.game_stage > CheckPoint.SECOND:
+                await channel.send(f"Du verlässt das Spiel mit {self.stages[9]}🕊.")
+                await self.update_ranking(session, self.stages[9])
+            elif session.game_stage > CheckPoint.FIRST:
+                await channel.send(f"Du verlässt das Spiel mit {self.stages[4]}🕊.")
+                await self.update_ranking(session, self.stages[4])
 
-        player_id = str(self.player.id)
+            await self.stop_quiz(session)
 
-        ranking = load_file("json/quiz_ranking.json")
+    async def stop_quiz(self, session: QuizSession) -> None:
+        """_summary_"""
 
-        if not isinstance(ranking, dict):
-            return
+        self.sessions.end(session)
 
-        ranking[player_id]["name"] = self.player.display_name
-        ranking[player_id]["points"] = ranking[player_id].get("points") + amount
-        ranking[player_id]["tries"] = ranking[player_id].get("tries") + 1
+    async def update_ranking(self, session: QuizSession, amount: int) -> None:
+        """Records the points of a finished game. The ranking is saved in the background."""
 
-        save_file("json/quiz_ranking.json", ranking)
+        self.ranking.record(str(session.player.id), session.player.display_name, amount)
 
     @commands.group(name="quiz", brief="Startet eine Quiz Runde")
     async def _quiz(self, ctx: commands.Context) -> None:
         if ctx.invoked_subcommand is not None:
             return
 
-        if self.player is not None:
+        if (session := self.sessions.get(ctx.channel.id)) is not None:
             await ctx.send(
-                "Aktuell läuft bereits ein Spiel mit "
-                + self.player.display_name
+                "Aktuell läuft hier bereits ein Spiel mit "
+                + session.player.display_name
                 + ". Ein Super-User kann das laufende Spiel mit "
                 + "!quiz stop beenden."
             )
             return
 
-        if not isinstance(ctx.author, discord.Member) or not isinstance(ctx.channel, discord.TextChannel):
+        if self.sessions.is_full:
+            await ctx.send("Es laufen bereits zu viele Spiele gleichzeitig, versuch es später nochmal, Krah Krah!")
             return
 
-        self.player = ctx.author
-        self.channel = ctx.channel
-        self.game_stage = 0
-
-        quiz = load_file("json/quiz.json")
+        if not isinstance(ctx.author, discord.Member) or not isinstance(ctx.channel, discord.TextChannel):
+            return
 
-        if not isinstance(quiz, list):
+        try:
+            await self.dataset.get_index()
+        except (OSError, ValueError, TypeError, DictFileLoadError):
+            logging.exception("Quiz questions couldn't be loaded.")
             return
 
-        self.quiz = quiz
+        if (session := self.sessions.start(ctx.author, ctx.channel)) is None:
+            return
 
         await ctx.send(
             "Hallo und herzlich Willkommen zu Wer Wird Mövionär! "
-            f"Heute mit dabei: {self.player.display_name}."
+            f"Heute mit dabei: {session.player.display_name}."
             "Los geht's, Krah Krah!"
         )
 
-        await self.get_random_question()
-        output = await self.get_question_output()
-
-        if output is None or not (isinstance(output["content"], str) and isinstance(output["embed"], discord.Embed)):
-            return
-
-        await ctx.send(content=output["content"], embed=output["embed"])
+        await self.ask_question(session)
 
     @is_super_user()
     @_quiz.command(name="stop", aliases=["-s"], brief="Beendet das laufende Quiz.")
     async def _stop(self, ctx: commands.Context) -> None:
-        if self.player is None:
-            await ctx.send("Bist du sicher? Aktuell läuft gar kein Quiz, Krah Krah!")
+        if (session := self.sessions.get(ctx.channel.id)) is None:
+            await ctx.send("Bist du sicher? Aktuell läuft hier gar kein Quiz, Krah Krah!")
             return
 
         await ctx.send(
-            f"Das laufende Quiz wurde abgebrochen. {self.player.display_name} geht leider leer aus, Krah Krah!"
+            f"Das laufende Quiz wurde abgebrochen. {session.player.display_name} geht leider leer aus, Krah Krah!"
         )
 
-        await self.stop_quiz()
+        await self.stop_quiz(session)
+
+    @is_super_user()
+    @_quiz.command(name="reload", brief="Lädt die Quizfragen neu.")
+    async def _reload(self, ctx: commands.Context) -> None:
+        start = time.perf_counter()
+
+        try:
+            index = await self.dataset.load()
+        except (OSError, ValueError, TypeError, DictFileLoadError):
+            logging.exception("Quiz questions couldn't be reloaded.")
+            await ctx.send("Die Quizfragen konnten nicht geladen werden, Krah Krah!")
+            return
+
+        await ctx.send(
+            f"{index.question_count} Quizfragen in {(time.perf_counter() - start) * 1000:.0f} ms geladen, Krah Krah!"
+        )
 
     @_quiz.command(
         name="report",
@@ -252,90 +272,79 @@ class Quiz(commands.Cog, name="Quiz"):
         usage="report <Grund>",
     )
     async def _report(self, ctx: commands.Context, *args: str) -> None:
-        with Path("logs/quiz_report.log").open("a+", encoding="utf-8") as file:  # noqa: ASYNC101
-            file.write(f"Grund: {' '.join(args)} - Frage: {self.question['question']}\n")
-
-        await ctx.send("Deine Meldung wurde abgeschickt.")
-
-        if self.player is None:
-            return
-
-        await self.get_random_question()
-        output = await self.get_question_output()
-
-        if output is None:
+        if (session := self.sessions.get(ctx.channel.id)) is None or not session.question:
+            await ctx.send("Aktuell läuft hier gar kein Quiz, Krah Krah!")
             return
 
-        if not (isinstance(output["content"], str) and isinstance(output["embed"], discord.Embed)):
-            return
+        await append_to_textfile(
+            "logs/quiz_report.log", [f"Grund: {' '.join(args)} - Frage: {session.question['question']}"]
+        )
 
-        if self.channel is None:
-            return
+        await ctx.send("Deine Meldung wurde abgeschickt.")
 
-        await self.channel.send(content=output["content"], embed=output["embed"])
+        session.touch()
+        await self.ask_question(session)
 
     @_quiz.command(name="rank", brief="Zeigt das Leaderboard an.")
-    async def _rank(self, ctx: commands.Context) -> None:
-        ranking = load_file("json/quiz_ranking.json")
-
-        if not isinstance(ranking, dict):
-            return
-
-        sorted_ranking = dict(sorted(ranking.items(), key=lambda item: item[1]["points"], reverse=True))
+    async def _rank(self, ctx: commands.Context, page: int = 1) -> None:
+        leaderboard = self.ranking.leaderboard
+        page = min(max(1, page), leaderboard.page_count())
+
+        page_entries = leaderboard.page(page)
+        names = self.bot.names.resolve_many(
+            (user_id for _, user_id, _ in page_entries),
+            {user_id: self.ranking.get(user_id)["name"] for _, user_id, _ in page_entries},
+        )
 
-        broken_users = []
-        max_length = {"name": 0, "points": 0}
-        for user_id, user_data in sorted_ranking.items():
-            if (user := self.bot.get_user(int(user_id))) is None:
-                broken_users.append(user_id)
-                continue
+        entries = [
+            (rank, name, points, self.ranking.get(user_id)["tries"])
+            for (rank, user_id, points), name in zip(page_entries, names, strict=True)
+        ]
 
-            if (user_name := user.display_name) is None:
-                broken_users.append(user_id)
-                continue
+        name_length = max((len(name) for _, name, _, _ in entries), default=0)
+        points_length = max((len(format(points, ",d")) for _, _, points, _ in entries), default=0)
 
-            name_length = len(user_name)
-            points = len(format(user_data["points"], ",d"))
+        embed = discord.Embed(
+            title="Punktetabelle Quiz",
+            colour=discord.Colour(0xFF00FF),
+            description="```"
+            + "\n".join(
+                [
+                    f"{rank:>4}. "
+                    + name.ljust(name_length + 4, " ")
+                    + (format(points, ",d").replace(",", ".") + "🕊").rjust(points_length + 4, " ")
+                    + (str(tries) + "Versuche").rjust(14, " ")
+                    for rank, name, points, tries in entries
+                ]
+            )
+            + "```",
+        )
+        embed.set_footer(text=f"Seite {page}/{leaderboard.page_count()}")
 
-            if max_length["name"] < name_length:
-                max_length["name"] = name_length
+        await ctx.send(embed=embed)
 
-            if max_length["points"] < points:
-                max_length["points"] = points
+    @_quiz.command(name="platz", aliases=["me"], brief="Zeigt, auf welchem Platz du im Leaderboard stehst.")
+    async def _my_rank(self, ctx: commands.Context) -> None:
+        leaderboard = self.ranking.leaderboard
 
-        for user_id in broken_users:
-            sorted_ranking.pop(user_id)
+        if (rank := leaderboard.rank(str(ctx.author.id))) is None:
+            await ctx.send("Du hast noch nie mitgespielt, Krah Krah!")
+            return
 
+        points = format(leaderboard.scores[str(ctx.author.id)], ",d").replace(",", ".")
         await ctx.send(
-            embed=discord.Embed(
-                title="Punktetabelle Quiz",
-                colour=discord.Colour(0xFF00FF),
-                description="```"
-                + "\n".join(
-                    [
-                        user.display_name.ljust(max_length["name"] + 4, " ")
-                        + (format(item[1]["points"], ",d").replace(",", ".") + "🕊").rjust(max_length["points"] + 4, " ")
-                        + (str(item[1]["tries"]) + "Versuche").rjust(14, " ")
-                        for item in sorted_ranking.items()
-                        if (user := self.bot.get_user(int(item[0]))) is not None
-                    ]
-                )
-                + "```",
-            )
+            f"Du bist auf Platz {rank} von {len(leaderboard)} mit {points}🕊 "
+            f"und findest dich auf Seite {leaderboard.page_of(str(ctx.author.id))}, Krah Krah!"
         )
 
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message) -> None:
-        """_summary_
+        """Passes the answer of a player to the game in the channel of the message."""
 
-        Args:
-            message (discord.Message): _description_
-        """
         if (
-            self.channel is None
-            or self.player != message.author
-            or message.channel != self.channel
-            or not isinstance(self.question["answers"], dict)
+            (session := self.sessions.get(message.channel.id)) is None
+            or session.player != message.author
+            or not isinstance(session.question.get("answers"), dict)
         ):
             return
 
@@ -343,25 +352,26 @@ class Quiz(commands.Cog, name="Quiz"):
 
         match user_answer:
             case "A" | "B" | "C" | "D":
-                await self.check_answer(user_answer)
+                session.touch()
+                await self.check_answer(session, user_answer)
 
             case "Q":
-                await self.channel.send(
+                await session.channel.send(
                     "Du verlässt das Spiel "
                     + (
                         "ohne Gewinn."
-                        if self.game_stage == 0
-                        else f"freiwillig mit {self.stages[self.game_stage - 1]}🕊."
+                        if session.game_stage == 0
+                        else f"freiwillig mit {self.stages[session.game_stage - 1]}🕊."
                     )
                 )
 
-                if self.game_stage == 0:
-                    await self.update_ranking(0)
+                if session.game_stage == 0:
+                    await self.update_ranking(session, 0)
                 else:
-                    await self.update_ranking(self.stages[self.game_stage - 1])
+                    await self.update_ranking(session, self.stages[session.game_stage - 1])
 
-                correct_answer = next(answer for answer in self.question["answers"].items() if answer[1]["correct"])
+                correct_answer = next(answer for answer in session.question["answers"].items() if answer[1]["correct"])
 
-                await self.channel.send(f"Die richtige Antwort ist {correct_answer[0]}: {correct_answer[1]['text']}")
+                await session.channel.send(f"Die richtige Antwort ist {correct_answer[0]}: {correct_answer[1]['text']}")
 
-                await self.stop_quiz()
+                await self.stop_quiz(session)
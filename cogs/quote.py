@@ -8,13 +8,13 @@ import time
 from typing import TYPE_CHECKING
 
 import discord
-import markovify
 from discord.ext import commands, tasks
 
 from tools.check_tools import is_super_user
 from tools.dt_tools import get_local_timezone
 from tools.embed_tools import QuoteEmbed
-from tools.textfile_tools import lines_from_textfile, lines_to_textfile
+from tools.markov_tools import load_markov_model
+from tools.textfile_tools import lines_to_textfile
 
 if TYPE_CHECKING:
     from bot import Bot
@@ -25,7 +25,7 @@ async def setup(bot: Bot) -> None:
 
     quote_cog = Quote(bot)
 
-    await quote_cog.build_markov()
+    await quote_cog.load_markov()
 
     await bot.add_cog(quote_cog)
     logging.info("Cog loaded: Quote.")
@@ -44,25 +44,24 @@ class Quote(commands.Cog, name="Quote"):
         self.daily_quote.cancel()
         logging.info("Cog unloaded: Quote.")
 
-    async def build_markov(self, size: int = 3) -> bool:
-        """Generates a markov model from the channel_messages.txt file.
+    async def load_markov(self, size: int = 3, *, rebuild: bool = False) -> bool:
+        """Loads the markov model of the channel_messages.txt file. The saved model is used,
+        if it was built from the same messages with the same size, otherwise it is built.
 
         Args:
             size (int, optional): The number of words per slice in the model. Defaults to 3.
+            rebuild (bool, optional): Builds the model even if a saved one fits. Defaults to False.
 
         Returns:
-            bool: Is True, if the generation was successful, and False, if the generation failed."""
+            bool: Is True, if the model was loaded, and False, if the loading failed."""
 
-        start_time = time.time()
-
-        if not (channel_messages := await lines_from_textfile("channel_messages.txt")):
+        if (model := await load_markov_model("channel_messages.txt", size, rebuild=rebuild)) is None:
             logging.error("No channel messages found!")
             return False
 
-        self.quote_by = channel_messages.pop(0)
-        self.text_model = markovify.NewlineText("\n".join(channel_messages), state_size=size)
+        self.quote_by = model.quote_by
+        self.text_model = model.text_model
 
-        logging.info("Generation finished. Size: %s Duration: %s", size, time.time() - start_time)
         return True
 
     async def send_quote(
@@ -173,7 +172,7 @@ class Quote(commands.Cog, name="Quote"):
         """Generiert das Modell für zufällige Zitate."""
 
         await ctx.send("Markov Update wird gestartet.")
-        await self.build_markov(size)
+        await self.load_markov(size, rebuild=True)
         await ctx.send("Markov Update abgeschlossen.")
 
     @tasks.loop(time=dt.time(9, tzinfo=get_local_timezone()))
@@ -0,0 +1,66 @@
+"""This tool contains small in-memory caches."""
+
+from __future__ import annotations
+
+import logging
+from collections import OrderedDict
+from typing import Generic, TypeVar
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+class LRUCache(Generic[K, V]):
+    """Mapping with a maximum size that drops the least recently used entry when it is
+    full. Counts hits and misses of get, so the size can be tuned."""
+
+    def __init__(self, name: str, maxsize: int) -> None:
+        self.name = name
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[K, V] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._data
+
+    def get(self, key: K) -> V | None:
+        """Returns the cached value and marks it as recently used. Returns None on a miss."""
+
+        try:
+            self._data.move_to_end(key)
+        except KeyError:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return self._data[key]
+
+    def put(self, key: K, value: V) -> None:
+        """Adds or replaces an entry. Drops the least recently used entry, if the cache is full."""
+
+        self._data[key] = value
+        self._data.move_to_end(key)
+
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: K) -> V | None:
+        return self._data.pop(key, None)
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / requests if (requests := self.hits + self.misses) else 0.0
+
+    def log_stats(self) -> None:
+        logging.info(
+            "Cache %s: %s entries, %s hits, %s misses, hit rate %.1f%%.",
+            self.name,
+            len(self._data),
+            self.hits,
+            self.misses,
+            self.hit_rate * 100,
+        )
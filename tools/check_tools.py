@@ -5,7 +5,7 @@ from enum import Enum
 import discord
 from discord.ext import commands
 
-from tools.json_tools import load_file
+from tools.json_tools import get_dict_file
 
 
 class SpecialUser(Enum):
@@ -25,12 +25,7 @@ def is_special_user(user_list: list[SpecialUser]):  # noqa: ANN201
 
 def is_super_user():  # noqa: ANN201
     async def wrapper(ctx: commands.Context) -> bool:
-        settings = load_file("json/settings.json")
-
-        if not isinstance(settings, dict):
-            return False
-
-        return ctx.author.name in settings["super-users"]
+        return ctx.author.name in get_dict_file("settings")["super-users"]
 
     return commands.check(wrapper)
 
@@ -0,0 +1,23 @@
+"""This tool contains helpers to run blocking file I/O outside of the event loop."""
+
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, TypeVar
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+T = TypeVar("T")
+
+IO_WORKERS = 4
+
+_IO_EXECUTOR = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="moevius-io")
+
+
+async def run_io(func: Callable[..., T], /, *args: object) -> T:
+    """Runs a blocking function in the bounded I/O thread pool, so the event loop and with
+    it the gateway heartbeat keep running while files are read or written."""
+
+    return await asyncio.get_running_loop().run_in_executor(_IO_EXECUTOR, func, *args)
@@ -2,11 +2,35 @@
 
 from __future__ import annotations
 
+import asyncio
+import contextlib
+import copy
 import datetime as dt
+import functools
 import json
 import logging
+import os
+import types
+import typing
+import weakref
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any, Protocol
+
+from tools.io_tools import run_io
+from tools.schema_tools import JournalRecord, KeepExtraKeys
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Callable, Iterable
 
 
 class EmptyPathError(IOError):
@@ -17,21 +41,225 @@ class DictFileLoadError(Exception):
     pass
 
 
+class SchemaError(DictFileLoadError):
+    def __init__(self, *args: object) -> None:
+        super().__init__(*args)
+        self.location: list[str | int] = []
+
+
+_WRITE_BEHIND_FILES: weakref.WeakValueDictionary[int, DictFile] = weakref.WeakValueDictionary()
+_DICT_FILES: dict[str, DictFile] = {}
+
+KeyPath = tuple[str, ...]
+
+_MISSING = object()
+
+
+class KeyPathOwner(Protocol):
+    """Anything that can persist changes of tracked nested values, like a DictFile."""
+
+    def before_change(self, path: KeyPath) -> None: ...
+
+    def persist_path(self, path: KeyPath) -> None: ...
+
+
 def json_ser(obj: object) -> str:
     if isinstance(obj, dt.datetime):
         return obj.isoformat()
     raise TypeError
 
 
-def load_file(file_path: str, /, encoding: str = "utf-8") -> dict[str, Any] | list[Any]:
+def validate(value: Any, schema: Any, /) -> Any:  # noqa: ANN401
+    """Checks a decoded JSON value against a schema made of builtin types, dict, list,
+    unions and TypedDicts. Returns the value, where TypedDicts only keep their own keys.
+
+    Raises SchemaError, if the value doesn't match the schema."""
+
+    try:
+        return _validator(schema)(value)
+    except SchemaError as err_msg:
+        location = "".join(f"[{key}]" if isinstance(key, int) else f".{key}" for key in reversed(err_msg.location))
+        msg = f"{err_msg} at ${location}"
+        raise SchemaError(msg) from err_msg
+
+
+def _type_error(schema: Any, value: Any) -> SchemaError:  # noqa: ANN401
+    return SchemaError(f"Expected {schema}, got {type(value).__name__}")
+
+
+@functools.cache
+def _validator(schema: Any) -> Callable[[Any], Any]:  # noqa: ANN401, C901
+    """Builds a validation function for a schema once, so validating doesn't have to
+    inspect the schema again for every value."""
+
+    if schema is Any:
+        return lambda value: value
+
+    origin = typing.get_origin(schema)
+
+    if origin in (typing.Union, types.UnionType):
+        options = [_validator(option) for option in typing.get_args(schema)]
+
+        def check_union(value: Any) -> Any:  # noqa: ANN401
+            for option in options:
+                try:
+                    return option(value)
+                except SchemaError:  # noqa: PERF203
+                    continue
+
+            raise _type_error(schema, value)
+
+        return check_union
+
+    if typing.is_typeddict(schema):
+        fields = {key: _validator(hint) for key, hint in typing.get_type_hints(schema).items()}
+        required = schema.__required_keys__
+
+        def check_typed_dict(value: Any) -> Any:  # noqa: ANN401
+            if not isinstance(value, dict):
+                raise _type_error(schema, value)
+
+            if missing := required - value.keys():
+                msg = f"Missing keys {sorted(missing)}"
+                raise SchemaError(msg)
+
+            return {key: _checked(check, value[key], key) for key, check in fields.items() if key in value}
+
+        return check_typed_dict
+
+    if origin is dict:
+        check_item = _validator(typing.get_args(schema)[1])
+
+        def check_dict(value: Any) -> Any:  # noqa: ANN401
+            if not isinstance(value, dict):
+                raise _type_error(schema, value)
+
+            return {key: _checked(check_item, item, key) for key, item in value.items()}
+
+        return check_dict
+
+    if origin is list:
+        check_item = _validator(typing.get_args(schema)[0])
+
+        def check_list(value: Any) -> Any:  # noqa: ANN401
+            if not isinstance(value, list):
+                raise _type_error(schema, value)
+
+            return [_checked(check_item, item, index) for index, item in enumerate(value)]
+
+        return check_list
+
+    expected: Any = type(None) if schema is None else (int, float) if schema is float else schema
+
+    def check_type(value: Any) -> Any:  # noqa: ANN401
+        if not isinstance(value, expected) or (isinstance(value, bool) and schema is not bool):
+            raise _type_error(schema, value)
+
+        return value
+
+    return check_type
+
+
+def _checked(check: Callable[[Any], Any], value: Any, key: str | int) -> Any:  # noqa: ANN401
+    try:
+        return check(value)
+    except SchemaError as err_msg:
+        err_msg.location.append(key)
+        raise
+
+
+class JsonCodec:
+    """Encodes and decodes JSON with the json module of the standard library."""
+
+    name = "json"
+
+    def decode(self, data: bytes, /, schema: Any = None) -> Any:  # noqa: ANN401
+        value = json.loads(data)
+        return value if schema is None else validate(value, schema)
+
+    def validate(self, value: Any, schema: Any, /) -> Any:  # noqa: ANN401
+        """Validates an already decoded value against a schema."""
+
+        return validate(value, schema)
+
+    def encode(self, obj: Any, /, indent: int | None = 4) -> bytes:  # noqa: ANN401
+        return json.dumps(obj, indent=indent, default=json_ser).encode()
+
+
+class OrjsonCodec(JsonCodec):
+    """Encodes and decodes JSON with orjson. Indented output always uses two spaces."""
+
+    name = "orjson"
+
+    def decode(self, data: bytes, /, schema: Any = None) -> Any:  # noqa: ANN401
+        value = orjson.loads(data)
+        return value if schema is None else validate(value, schema)
+
+    def encode(self, obj: Any, /, indent: int | None = 4) -> bytes:  # noqa: ANN401
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, default=json_ser, option=option)
+
+
+class MsgspecCodec(JsonCodec):
+    """Encodes and decodes JSON with msgspec. Schemas are validated while decoding."""
+
+    name = "msgspec"
+
+    def decode(self, data: bytes, /, schema: Any = None) -> Any:  # noqa: ANN401
+        try:
+            return msgspec.json.decode(data, type=Any if schema is None else schema)
+        except msgspec.ValidationError as err_msg:
+            raise SchemaError(str(err_msg)) from err_msg
+
+    def validate(self, value: Any, schema: Any, /) -> Any:  # noqa: ANN401
+        try:
+            return msgspec.convert(value, schema)
+        except msgspec.ValidationError as err_msg:
+            raise SchemaError(str(err_msg)) from err_msg
+
+    def encode(self, obj: Any, /, indent: int | None = 4) -> bytes:  # noqa: ANN401
+        data = msgspec.json.encode(obj, enc_hook=json_ser)
+        return msgspec.json.format(data, indent=indent) if indent else data
+
+
+def available_codecs() -> dict[str, JsonCodec]:
+    """Returns all usable codecs, starting with the fastest one."""
+
+    codecs: list[JsonCodec] = []
+
+    if msgspec is not None:
+        codecs.append(MsgspecCodec())
+
+    if orjson is not None:
+        codecs.append(OrjsonCodec())
+
+    codecs.append(JsonCodec())
+
+    return {codec.name: codec for codec in codecs}
+
+
+CODEC = next(iter(available_codecs().values()))
+
+
+def load_file(
+    file_path: str,
+    /,
+    encoding: str = "utf-8",
+    schema: Any = None,  # noqa: ANN401
+) -> dict[str, Any] | list[Any]:
     """Opens a JSON-file under the specified path and converts it to a dict.
 
     Raises EmptyPathError, if the file path is empty.
     Raieses OSError, if reading the file failed.
+    Raises SchemaError, if a schema is given and the file doesn't match it.
+
+    Keys that aren't part of the schema are dropped, unless the schema is marked with
+    KeepExtraKeys. Then they are kept and logged, so they can be added to the schema.
 
     Args:
         file_path (str): Path to the given JSON-file, including .json suffix
         encoding (str, optional): Defaults to 'utf-8'.
+        schema (Any, optional): Type from the schema_tools to validate the file against.
 
     Returns:
         dict: The requested JSON-file, parsed as Python dict."""
@@ -40,47 +268,377 @@ def load_file(file_path: str, /, encoding: str = "utf-8") -> dict[str, Any] | li
         msg = "Can't load file, file_path is empty."
         raise EmptyPathError(msg)
 
-    with Path(file_path).open("r", encoding=encoding) as file:
-        return json.load(file)
+    data = Path(file_path).read_bytes()
+
+    if encoding.replace("-", "").lower() != "utf8":
+        data = data.decode(encoding).encode()
 
+    if typing.get_origin(schema) is not typing.Annotated or KeepExtraKeys not in schema.__metadata__:
+        return CODEC.decode(data, schema)
 
-def save_file(file_path: str, content: dict, /, indent: int = 4, encoding: str = "utf-8") -> None:
+    value = CODEC.decode(data)
+    validated = CODEC.validate(value, typing.get_args(schema)[0])
+
+    if isinstance(value, dict) and (extra_keys := value.keys() - validated.keys()):
+        logging.info("Keys of %s that aren't part of its schema: %s", file_path, ", ".join(sorted(extra_keys)))
+        return {key: validated.get(key, item) for key, item in value.items()}
+
+    return validated
+
+
+def save_file(file_path: str, content: dict, /, indent: int | None = 4, encoding: str = "utf-8") -> None:
     """Writes the content dict into a JSON-file under the specified path.
 
+    The content is written to a temporary file first which then replaces the
+    target, so a crash mid-write never leaves a truncated file behind.
+
     Raises EmptyPathError, if the file path is empty.
     Raieses OSError, if writing the file failed.
 
     Args:
         file_path (str): Path to the desired JSON-file, including .json suffix
         content (dict): _description_
-        indent (int, optional): _description_. Defaults to 4."""
+        indent (int | None, optional): None writes compact JSON. Defaults to 4."""
+
+    if str(file_path) == "":
+        msg = "Can't save file, file_path is empty."
+        raise EmptyPathError(msg)
+
+    write_atomic(file_path, CODEC.encode(content, indent), encoding)
+
+
+def write_atomic(file_path: str, data: bytes, /, encoding: str = "utf-8") -> None:
+    """Writes UTF-8 encoded data to a temporary file and moves it to the given path afterwards."""
+
+    if encoding.replace("-", "").lower() != "utf8":
+        data = data.decode().encode(encoding)
+
+    tmp_path = Path(f"{file_path}.tmp")
+
+    with tmp_path.open("wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+
+    tmp_path.replace(file_path)
+
+
+async def async_load_file(
+    file_path: str,
+    /,
+    encoding: str = "utf-8",
+    schema: Any = None,  # noqa: ANN401
+) -> dict[str, Any] | list[Any]:
+    """Like load_file, but reading and parsing the file happens in the I/O thread pool."""
+
+    return await run_io(load_file, file_path, encoding, schema)
+
+
+async def async_save_file(file_path: str, content: dict, /, indent: int | None = 4, encoding: str = "utf-8") -> None:
+    """Like save_file, but the file is written in the I/O thread pool.
+
+    The content is serialized before handing it over, so the written file is a consistent
+    snapshot even if the content is changed while the file is being written."""
 
     if str(file_path) == "":
         msg = "Can't save file, file_path is empty."
         raise EmptyPathError(msg)
 
-    with Path(file_path).open("w", encoding=encoding) as file:
-        json.dump(content, file, indent=indent, default=json_ser)
+    await run_io(write_atomic, file_path, CODEC.encode(content, indent), encoding)
+
+
+def flush_dict_files() -> None:
+    """Writes all pending changes of DictFiles in write-behind mode to disk."""
+
+    for dict_file in list(_WRITE_BEHIND_FILES.values()):
+        dict_file.flush()
+
+
+def track(value: Any, owner: KeyPathOwner, path: KeyPath, *, exact: bool = True) -> Any:  # noqa: ANN401
+    """Wraps nested dicts and lists into containers that report their changes to the owner.
+
+    Changes inside a dict are reported with the path of the changed key. Lists can change
+    their indices, so every change inside a list is reported with the path of the list."""
+
+    if isinstance(value, dict):
+        return TrackedDict(value, owner, path, exact=exact)
+
+    if isinstance(value, list):
+        return TrackedList(value, owner, path)
+
+    return value
+
+
+class TrackedDict(dict):
+    """Nested dict of a DictFile. Reports every change to the DictFile it belongs to,
+    before it happens and afterwards."""
+
+    def __init__(self, data: dict, owner: KeyPathOwner, path: KeyPath, /, *, exact: bool = True) -> None:
+        self._owner = owner
+        self._path = path
+        self._exact = exact
+
+        super().__init__({key: self._track(key, value) for key, value in data.items()})
+
+    def __reduce__(self) -> tuple:
+        return dict, (dict(self),)
+
+    def _key_path(self, key: str) -> KeyPath:
+        return (*self._path, key) if self._exact else self._path
+
+    def _track(self, key: str, value: Any) -> Any:  # noqa: ANN401
+        return track(value, self._owner, self._key_path(key), exact=self._exact)
+
+    def __setitem__(self, __key: str, __value: Any) -> None:  # noqa: ANN401
+        self._owner.before_change(self._path)
+        super().__setitem__(__key, self._track(__key, __value))
+        self._owner.persist_path(self._key_path(__key))
+
+    def __delitem__(self, __key: str) -> None:
+        self._owner.before_change(self._path)
+        super().__delitem__(__key)
+        self._owner.persist_path(self._key_path(__key))
+
+    def pop(self, key, *default):  # noqa: ANN001, ANN002, ANN201
+        self._owner.before_change(self._path)
+        had_key = key in self
+        item = super().pop(key, *default)
+
+        if had_key:
+            self._owner.persist_path(self._key_path(key))
+
+        return item
+
+    def popitem(self) -> tuple[str, Any]:
+        self._owner.before_change(self._path)
+        item = super().popitem()
+        self._owner.persist_path(self._key_path(item[0]))
+        return item
+
+    def setdefault(self, key, default=None):  # noqa: ANN001, ANN201
+        if key not in self:
+            self[key] = default
+
+        return self[key]
+
+    def update(self, __m=(), **kwargs) -> None:  # noqa: ANN001, ANN003
+        for key, value in dict(__m, **kwargs).items():
+            self[key] = value
+
+    def clear(self) -> None:
+        self._owner.before_change(self._path)
+        super().clear()
+        self._owner.persist_path(self._path)
+
+
+class TrackedList(list):
+    """Nested list of a DictFile. Reports every change to the DictFile it belongs to,
+    before it happens and afterwards."""
+
+    def __init__(self, data: Iterable, owner: KeyPathOwner, path: KeyPath, /) -> None:
+        self._owner = owner
+        self._path = path
+
+        super().__init__(self._track(value) for value in data)
+
+    def __reduce__(self) -> tuple:
+        return list, (list(self),)
+
+    def _track(self, value: Any) -> Any:  # noqa: ANN401
+        return track(value, self._owner, self._path, exact=False)
+
+    def _changed(self) -> None:
+        self._owner.persist_path(self._path)
+
+    def __setitem__(self, index, value) -> None:  # noqa: ANN001
+        self._owner.before_change(self._path)
+        if isinstance(index, slice):
+            super().__setitem__(index, [self._track(item) for item in value])
+        else:
+            super().__setitem__(index, self._track(value))
+
+        self._changed()
+
+    def __delitem__(self, index) -> None:  # noqa: ANN001
+        self._owner.before_change(self._path)
+        super().__delitem__(index)
+        self._changed()
+
+    def __iadd__(self, other):  # noqa: ANN001, ANN204
+        self.extend(other)
+        return self
+
+    def __imul__(self, other):  # noqa: ANN001, ANN204
+        self._owner.before_change(self._path)
+        super().__imul__(other)
+        self._changed()
+        return self
+
+    def append(self, value: Any) -> None:  # noqa: ANN401
+        self._owner.before_change(self._path)
+        super().append(self._track(value))
+        self._changed()
+
+    def extend(self, values: Iterable) -> None:
+        self._owner.before_change(self._path)
+        super().extend(self._track(value) for value in values)
+        self._changed()
+
+    def insert(self, index, value) -> None:  # noqa: ANN001
+        self._owner.before_change(self._path)
+        super().insert(index, self._track(value))
+        self._changed()
+
+    def pop(self, index=-1):  # noqa: ANN001, ANN201
+        self._owner.before_change(self._path)
+        item = super().pop(index)
+        self._changed()
+        return item
+
+    def remove(self, value) -> None:  # noqa: ANN001
+        self._owner.before_change(self._path)
+        super().remove(value)
+        self._changed()
+
+    def clear(self) -> None:
+        self._owner.before_change(self._path)
+        super().clear()
+        self._changed()
+
+    def sort(self, *args, **kwargs) -> None:  # noqa: ANN002, ANN003
+        self._owner.before_change(self._path)
+        super().sort(*args, **kwargs)
+        self._changed()
+
+    def reverse(self) -> None:
+        self._owner.before_change(self._path)
+        super().reverse()
+        self._changed()
+
+
+def is_journal_record(record: JournalRecord) -> bool:
+    """Checks the parts of a journal record the schema can't express."""
+
+    return bool(record["path"]) and (record["op"] == "pop" or (record["op"] == "set" and "value" in record))
+
+
+def apply_journal_record(data: dict, record: JournalRecord) -> None:
+    """Applies a single journal record to a plain dict. Records whose parents
+    don't exist anymore are skipped."""
+
+    *parents, last = record["path"]
+
+    for key in parents:
+        data = data.get(key)
+
+        if not isinstance(data, dict):
+            return
+
+    if record["op"] == "set":
+        data[last] = record["value"]
+    else:
+        data.pop(last, None)
+
+
+def get_dict_file(name: str, /, **kwargs: Any) -> DictFile:  # noqa: ANN401
+    """Returns the shared DictFile for the given name, so every cog works on the same data
+    and the file is only parsed once. The DictFile is reloaded, if its file was changed on
+    disk since it was last loaded or written.
+
+    The keyword arguments are passed to DictFile when the shared instance is created and
+    are ignored afterwards."""
+
+    if (dict_file := _DICT_FILES.get(name)) is None:
+        dict_file = _DICT_FILES[name] = DictFile(name, **kwargs)
+        return dict_file
+
+    dict_file.reload_if_changed()
+
+    return dict_file
+
+
+def file_stat(file_path: str) -> tuple[int, int] | None:
+    """Returns modification time and size of a file or None, if the file doesn't exist."""
+
+    try:
+        stat = Path(file_path).stat()
+    except FileNotFoundError:
+        return None
+
+    return stat.st_mtime_ns, stat.st_size
 
 
 class DictFile(dict):
     """Extension to the dict type to automatically save the dictionary as a .json-file
     when it is updated. Additionally new dicts can directly by populated with data from
-    a file."""
-
-    def __init__(
-        self, name: str, /, suffix: str = ".json", path: str = "json/", *, load_from_file: bool = True
+    a file.
+
+    In write-behind mode, changes only mark the dict as dirty. The file is then written
+    after flush_interval seconds or as soon as flush_changes changes are pending.
+
+    Nested dicts and lists are tracked as well, so changes like dict_file["a"]["b"] = 1
+    are persisted without calling save() by hand. Values are copied into tracked
+    containers when they are stored.
+
+    In journal mode, every changed key path is appended as a single line to a
+    .journal-file next to the snapshot instead of rewriting the whole file. A nested
+    change only writes the changed subtree. When loading, the journal is replayed on top
+    of the snapshot. Once the journal grows beyond compact_size bytes, it is folded back
+    into the snapshot.
+
+    Compact DictFiles are written without indentation, which is meant for files that are
+    only read by the bot. With a schema from the schema_tools, the file is validated while
+    it is loaded."""
+
+    def __init__(  # noqa: PLR0913
+        self,
+        name: str,
+        /,
+        suffix: str = ".json",
+        path: str = "json/",
+        *,
+        load_from_file: bool = True,
+        write_behind: bool = False,
+        flush_interval: float = 5.0,
+        flush_changes: int = 100,
+        journal: bool = False,
+        compact_size: int = 1_048_576,
+        compact: bool = False,
+        schema: Any = None,  # noqa: ANN401
+        default: dict[str, Any] | None = None,
     ) -> None:
         """Initializes a new dict which is linked to a file.
 
         By default, it tries to load data from the file when created.
         The usual path for this is ./json/name.json and if the path
-        does not exist, the dicts will be created."""
+        does not exist, the dicts will be created. If the file does
+        not exist and a default is given, the file is created with the
+        default as its content."""
 
         logging.debug("Initializing DictFile %s ...", name)
 
         super().__init__()
         self.file_name = path + name + suffix
+        self.journal_name = path + name + ".journal"
+
+        self.write_behind = write_behind
+        self.flush_interval = flush_interval
+        self.flush_changes = flush_changes
+        self.journal = journal
+        self.compact_size = compact_size
+        self.indent = None if compact else 4
+        self.schema = schema
+        self.pending_changes = 0
+        self.dirty_paths: dict[KeyPath, None] = {}
+        self.disk_state: tuple[tuple[int, int] | None, ...] = ()
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._lock = asyncio.Lock()
+        self._transaction_task: asyncio.Task | None = None
+        self._transaction_depth = 0
+        self._undo: dict[str, Any] | None = None
+
+        if write_behind:
+            _WRITE_BEHIND_FILES[id(self)] = self
 
         if not Path(path).exists():
             Path(path).mkdir(parents=True)
@@ -89,39 +647,314 @@ class DictFile(dict):
         if not load_from_file:
             return
 
-        json_file = load_file(self.file_name)
-
-        if not isinstance(json_file, dict):
-            msg = "DictFile could not be loaded. JSON-File formatted wrong."
-            raise DictFileLoadError(msg)
+        if default is not None and not Path(self.file_name).exists():
+            save_file(self.file_name, default, self.indent)
+            logging.info("DictFile %s created with its default content.", self.file_name)
 
-        self.update(json_file)
+        self.load()
 
-        logging.debug("Loaded data from file %s. %s keys.", self.file_name, len(json_file.keys()))
         logging.info("DictFile %s initialized succesfully.", self.file_name)
 
+    def __reduce__(self) -> tuple:
+        return dict, (dict(self),)
+
     def __setitem__(self, __key: str, __value: Any) -> None:  # noqa: ANN401
-        super().__setitem__(__key, __value)
+        self.before_change((__key,))
+        super().__setitem__(__key, track(__value, self, (__key,)))
 
         logging.debug("DictFile %s item set. %s: %s", self.file_name, __key, __value)
 
-        save_file(self.file_name, self)
+        self.persist(__key)
+
+    def __delitem__(self, __key: str) -> None:
+        self.before_change((__key,))
+        super().__delitem__(__key)
+
+        logging.debug("DictFile %s item deleted. %s", self.file_name, __key)
+
+        self.persist(__key)
 
     def update(self, __m) -> None:  # noqa: ANN001
-        super().update(__m)
+        new_items = dict(__m)
+
+        for key in new_items:
+            self.before_change((key,))
+
+        super().update({key: track(value, self, (key,)) for key, value in new_items.items()})
 
         logging.debug("DictFile %s updated", self.file_name)
 
-        save_file(self.file_name, self)
+        self.persist(*new_items)
+
+    def pop(self, key, *default):  # noqa: ANN001, ANN002, ANN201
+        if key not in self and default:
+            return default[0]
 
-    def pop(self, key):  # noqa: ANN001, ANN201
+        self.before_change((key,))
         item = super().pop(key)
 
         logging.debug("DictFile %s popped.", self.file_name)
 
-        save_file(self.file_name, self)
+        self.persist(key)
 
         return item
 
+    def setdefault(self, key, default=None):  # noqa: ANN001, ANN201
+        if key not in self:
+            self[key] = default
+
+        return self[key]
+
+    def load(self) -> None:
+        """Replaces the content of the dict with the data from its file and journal."""
+
+        json_file = load_file(self.file_name, schema=self.schema)
+
+        if not isinstance(json_file, dict):
+            msg = "DictFile could not be loaded. JSON-File formatted wrong."
+            raise DictFileLoadError(msg)
+
+        logging.debug("Loaded data from file %s. %s keys.", self.file_name, len(json_file.keys()))
+
+        if self.journal:
+            self.replay_journal(json_file)
+
+        super().clear()
+        super().update({key: track(value, self, (key,)) for key, value in json_file.items()})
+
+        self.disk_state = self.current_disk_state()
+
+    def current_disk_state(self) -> tuple[tuple[int, int] | None, ...]:
+        return file_stat(self.file_name), file_stat(self.journal_name)
+
+    def reload_if_changed(self) -> bool:
+        """Reloads the dict, if its file or journal was changed by someone else since it was
+        last loaded or written. Pending changes are kept instead of being overwritten.
+
+        Returns:
+            bool: Is True, if the dict was reloaded."""
+
+        if self.current_disk_state() == self.disk_state:
+            return False
+
+        if self.pending_changes:
+            logging.warning("DictFile %s changed on disk but has pending changes. Not reloaded.", self.file_name)
+            return False
+
+        logging.info("DictFile %s changed on disk, reloading.", self.file_name)
+        self.load()
+
+        return True
+
+    @contextlib.asynccontextmanager
+    async def transaction(self) -> AsyncIterator[DictFile]:
+        """Applies several changes under a lock and persists them once at the end.
+
+        Other coroutines wait until the transaction is finished before they can start their
+        own, so read-modify-write cycles can't interleave. Transactions can be nested within
+        the same task. If the transaction fails, all changes made within it are undone."""
+
+        if (task := asyncio.current_task()) is not None and task is self._transaction_task:
+            self._transaction_depth += 1
+
+            try:
+                yield self
+            finally:
+                self._transaction_depth -= 1
+
+            return
+
+        async with self._lock:
+            self._transaction_task = task
+            self._transaction_depth = 1
+            self._undo = {}
+
+            try:
+                yield self
+            except BaseException:
+                self.rollback()
+                raise
+            finally:
+                self._transaction_task = None
+                self._transaction_depth = 0
+                self._undo = None
+
+                if self.pending_changes:
+                    self.flush_if_due()
+
+    def before_change(self, path: KeyPath) -> None:
+        """Remembers the value of the top-level key of a path before it is changed within a
+        transaction, so the change can be undone. Changes of other tasks aren't part of the
+        transaction. If they change a key of the transaction, their value is kept on rollback."""
+
+        if self._undo is None:
+            return
+
+        if not self._in_transaction_task():
+            self._undo.pop(path[0], None)
+            return
+
+        if path[0] in self._undo:
+            return
+
+        value = dict.get(self, path[0], _MISSING)
+        self._undo[path[0]] = value if value is _MISSING else copy.deepcopy(value)
+
+    def _in_transaction_task(self) -> bool:
+        try:
+            return asyncio.current_task() is self._transaction_task
+        except RuntimeError:
+            return False
+
+    def rollback(self) -> None:
+        """Restores the values that were changed within the running transaction. The
+        restored keys are marked as changed, so the file matches the dict again."""
+
+        if not self._undo:
+            return
+
+        for key, value in self._undo.items():
+            if value is _MISSING:
+                super().pop(key, None)
+            else:
+                super().__setitem__(key, track(value, self, (key,)))
+
+            self.dirty_paths[(key,)] = None
+
+        self.pending_changes += len(self._undo)
+
+        logging.warning("DictFile %s rolled back %s keys.", self.file_name, len(self._undo))
+
+    def persist(self, *keys: str) -> None:
+        """Marks the given top-level keys as changed and persists them."""
+
+        for key in keys:
+            self.dirty_paths[(key,)] = None
+
+        self.schedule_flush()
+
+    def persist_path(self, path: KeyPath) -> None:
+        """Marks the given key path as changed and persists it."""
+
+        self.dirty_paths[path] = None
+        self.schedule_flush()
+
+    def schedule_flush(self) -> None:
+        """Writes pending changes to disk immediately or, in write-behind mode, schedules a flush."""
+
+        self.pending_changes += 1
+        self.flush_if_due()
+
+    def flush_if_due(self) -> None:
+        """Flushes right away, unless a transaction is running or write-behind mode waits
+        for more changes. In that case, a flush is scheduled."""
+
+        if self._transaction_depth:
+            return
+
+        if not self.write_behind or self.pending_changes >= self.flush_changes:
+            self.flush()
+            return
+
+        if self._flush_handle is not None:
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+
+        self._flush_handle = loop.call_later(self.flush_interval, self.flush)
+
+    def flush(self) -> None:
+        """Writes pending changes to disk. Does nothing if there are none. While a
+        transaction is running, nothing is written, the transaction flushes when it ends."""
+
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        if not self.pending_changes or self._transaction_depth:
+            return
+
+        logging.debug("DictFile %s flushing %s changes.", self.file_name, self.pending_changes)
+
+        if not self.journal:
+            self.save()
+            return
+
+        with Path(self.journal_name).open("ab") as file:
+            for path in self.dirty_paths:
+                if any(path[:depth] in self.dirty_paths for depth in range(1, len(path))):
+                    continue
+
+                file.write(CODEC.encode(self.journal_record(path), None) + b"\n")
+
+            journal_size = file.tell()
+
+        self.dirty_paths.clear()
+        self.pending_changes = 0
+        self.disk_state = self.current_disk_state()
+
+        if journal_size > self.compact_size:
+            logging.info("Journal of DictFile %s reached %s bytes, compacting.", self.file_name, journal_size)
+            self.save()
+
+    def journal_record(self, path: KeyPath) -> dict[str, Any]:
+        """Builds the journal record for the current value under the given key path."""
+
+        value: Any = self
+
+        for key in path:
+            if not isinstance(value, dict) or key not in value:
+                return {"op": "pop", "path": path}
+
+            value = value[key]
+
+        return {"op": "set", "path": path, "value": value}
+
+    def replay_journal(self, data: dict) -> None:
+        """Applies the records of the journal file to the loaded data, if there is one. A
+        broken last record is removed from the journal, broken records in between and
+        records that don't match the format are skipped."""
+
+        if not Path(self.journal_name).exists():
+            return
+
+        records = 0
+        offset = 0
+        lines = Path(self.journal_name).read_bytes().splitlines(keepends=True)
+
+        for number, line in enumerate(lines, 1):
+            try:
+                record = CODEC.decode(line, JournalRecord) if line.endswith(b"\n") else None
+            except (ValueError, DictFileLoadError):
+                record = None
+
+            if record is None or not is_journal_record(record):
+                if number == len(lines):
+                    logging.warning("Journal of DictFile %s ends with a broken record, truncating.", self.file_name)
+                    os.truncate(self.journal_name, offset)
+                    break
+
+                logging.warning("Journal of DictFile %s: broken record in line %s skipped.", self.file_name, number)
+            else:
+                apply_journal_record(data, record)
+                records += 1
+
+            offset += len(line)
+
+        logging.debug("Replayed %s journal records for DictFile %s.", records, self.file_name)
+
     def save(self) -> None:
-        save_file(self.file_name, self)
+        """Writes the whole dict to its file. In journal mode, this also compacts the journal."""
+
+        save_file(self.file_name, self, self.indent)
+
+        if self.journal:
+            Path(self.journal_name).unlink(missing_ok=True)
+
+        self.dirty_paths.clear()
+        self.pending_changes = 0
+        self.disk_state = self.current_disk_state()
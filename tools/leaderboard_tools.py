@@ -0,0 +1,81 @@
+"""This tool contains a leaderboard that stays sorted while the scores change.
+
+Changing a score, looking up the rank of a member and reading a page of the leaderboard
+take O(log n) instead of sorting all scores again."""
+
+from __future__ import annotations
+
+import math
+from typing import TYPE_CHECKING
+
+from sortedcontainers import SortedList
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+PAGE_SIZE = 20
+
+
+class Leaderboard:
+    """Ranking of members by their score, highest score first. Members with the same
+    score share their rank."""
+
+    def __init__(self, scores: Iterable[tuple[str, int]] = ()) -> None:
+        self.scores: dict[str, int] = dict(scores)
+        self._sorted = SortedList((-score, member_id) for member_id, score in self.scores.items())
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def __contains__(self, member_id: object) -> bool:
+        return member_id in self.scores
+
+    def update(self, member_id: str, score: int) -> None:
+        """Sets the score of a member and moves it to its new position."""
+
+        if (old_score := self.scores.get(member_id)) is not None:
+            self._sorted.remove((-old_score, member_id))
+
+        self.scores[member_id] = score
+        self._sorted.add((-score, member_id))
+
+    def remove(self, member_id: str) -> None:
+        if (score := self.scores.pop(member_id, None)) is not None:
+            self._sorted.remove((-score, member_id))
+
+    def rank(self, member_id: str) -> int | None:
+        """Returns the rank of a member, starting at 1, or None if the member has no score."""
+
+        if (score := self.scores.get(member_id)) is None:
+            return None
+
+        return self._sorted.bisect_left((-score,)) + 1
+
+    def top(self, count: int) -> list[tuple[int, str, int]]:
+        """Returns rank, member ID and score of the best members."""
+
+        return self.slice(0, count)
+
+    def page(self, page: int, page_size: int = PAGE_SIZE) -> list[tuple[int, str, int]]:
+        """Returns rank, member ID and score of the members on a page, starting at page 1."""
+
+        return self.slice((page - 1) * page_size, page * page_size)
+
+    def page_count(self, page_size: int = PAGE_SIZE) -> int:
+        return max(1, math.ceil(len(self) / page_size))
+
+    def page_of(self, member_id: str, page_size: int = PAGE_SIZE) -> int | None:
+        """Returns the page that contains the given member."""
+
+        if (score := self.scores.get(member_id)) is None:
+            return None
+
+        return self._sorted.index((-score, member_id)) // page_size + 1
+
+    def slice(self, start: int, stop: int) -> list[tuple[int, str, int]]:
+        output = []
+
+        for negative_score, member_id in self._sorted.islice(max(0, start), stop):
+            output.append((self._sorted.bisect_left((negative_score,)) + 1, member_id, -negative_score))
+
+        return output
@@ -0,0 +1,240 @@
+"""This tool contains an append-only ledger for balances like the faith points.
+
+Every change is appended as one line to the ledger file, which makes the ledger an audit
+trail that can be replayed. The current balances are kept in memory and written to a
+checkpoint from time to time. Loading only replays the events after the checkpoint."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from tools.json_tools import CODEC, DictFile, DictFileLoadError, async_save_file, load_file, save_file
+from tools.leaderboard_tools import Leaderboard
+from tools.schema_tools import LedgerCheckpoint, LedgerEvent
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+
+class Ledger:
+    """Balances per member with an append-only ledger of their changes.
+
+    Events contain the timestamp, the member, the delta, the reason and the resulting
+    balance. Because of the resulting balance, replaying an event twice is harmless.
+    The balances are saved to the snapshot file every checkpoint_interval seconds or after
+    checkpoint_events events, together with the ledger offset they include.
+
+    The balances are ranked in a leaderboard, which is updated with every event.
+
+    The snapshot has the same format as a DictFile, an existing journal of the DictFile is
+    applied once when the ledger is loaded."""
+
+    def __init__(  # noqa: PLR0913
+        self,
+        name: str,
+        /,
+        path: str = "json/",
+        *,
+        checkpoint_interval: float = 300.0,
+        checkpoint_events: int = 1000,
+        schema: Any = None,  # noqa: ANN401
+    ) -> None:
+        self.name = name
+        self.snapshot_name = f"{path}{name}.json"
+        self.ledger_name = f"{path}{name}_ledger.jsonl"
+        self.checkpoint_name = f"{path}{name}_ledger.checkpoint.json"
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_events = checkpoint_events
+        self.schema = schema
+
+        self.balances: dict[str, int] = {}
+        self.leaderboard = Leaderboard()
+        self.pending_events = 0
+        self._checkpoint_handle: asyncio.TimerHandle | None = None
+        self._checkpoint_lock = asyncio.Lock()
+        self._checkpoint_tasks: set[asyncio.Task] = set()
+
+        if Path(f"{path}{name}.journal").exists():
+            DictFile(name, path=path, journal=True, schema=schema).save()
+            logging.info("Journal of %s applied to the snapshot.", name)
+
+        self.load()
+
+        logging.info("Ledger %s loaded with %s balances.", name, len(self.balances))
+
+    def load(self) -> None:
+        """Loads the balances of the last checkpoint and replays the newer events."""
+
+        self.balances = dict(load_file(self.snapshot_name, schema=self.schema))
+
+        offset = 0
+        if Path(self.checkpoint_name).exists():
+            offset = load_file(self.checkpoint_name, schema=LedgerCheckpoint)["offset"]
+
+        replayed = 0
+        for event in self.events(offset, truncate=True):
+            self.balances[event["member"]] = event["balance"]
+            replayed += 1
+
+        self.pending_events = replayed
+        self.leaderboard = Leaderboard(self.balances.items())
+
+        logging.debug("Replayed %s ledger events of %s.", replayed, self.name)
+
+    def events(self, offset: int = 0, *, truncate: bool = False) -> Iterator[LedgerEvent]:
+        """Reads the events of the ledger, starting at the given byte offset, up to the end
+        of the ledger when reading starts. A broken last line is left out or, if truncate is
+        set, removed from the ledger. Broken lines in between are skipped."""
+
+        if not Path(self.ledger_name).exists():
+            return
+
+        with Path(self.ledger_name).open("rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            file.seek(offset)
+
+            while offset < size and (line := file.readline()):
+                try:
+                    event = CODEC.decode(line, LedgerEvent) if line.endswith(b"\n") else None
+                except (ValueError, DictFileLoadError):
+                    event = None
+
+                if event is None and offset + len(line) >= size:
+                    logging.warning("Ledger %s ends with a broken event.", self.name)
+
+                    if truncate:
+                        os.truncate(self.ledger_name, offset)
+
+                    return
+
+                if event is None:
+                    logging.warning("Ledger %s has a broken event at offset %s, skipped.", self.name, offset)
+                else:
+                    yield event
+
+                offset += len(line)
+
+    def history(self, member_id: str, length: int) -> list[LedgerEvent]:
+        """Returns the last events of a member, oldest first. Reads the whole ledger, so it
+        should run in the I/O thread pool."""
+
+        return list(deque((event for event in self.events() if event["member"] == member_id), maxlen=length))
+
+    def get(self, member_id: str, default: int = 0) -> int:
+        return self.balances.get(member_id, default)
+
+    def add(self, member_id: str, delta: int, reason: str) -> int:
+        """Changes the balance of a member by delta. Returns the new balance."""
+
+        return self.add_many([(member_id, delta)], reason)[0]
+
+    def set(self, member_id: str, balance: int, reason: str) -> None:
+        """Sets the balance of a member to a specific value."""
+
+        self.add(member_id, balance - self.get(member_id), reason)
+
+    def add_many(self, changes: Iterable[tuple[str, int]], reason: str) -> list[int]:
+        """Changes the balances of several members at once. The events are appended with a
+        single write, so they are persisted together. Returns the new balances."""
+
+        timestamp = time.time()
+        events: list[LedgerEvent] = []
+
+        for member_id, delta in changes:
+            balance = self.balances[member_id] = self.get(member_id) + delta
+            self.leaderboard.update(member_id, balance)
+            events.append(
+                {"timestamp": timestamp, "member": member_id, "delta": delta, "reason": reason, "balance": balance}
+            )
+
+        with Path(self.ledger_name).open("ab") as file:
+            file.write(b"".join(CODEC.encode(event, None) + b"\n" for event in events))
+
+        self.pending_events += len(events)
+        self.schedule_checkpoint()
+
+        return [event["balance"] for event in events]
+
+    def schedule_checkpoint(self) -> None:
+        """Starts a checkpoint right away, if enough events are pending. Otherwise, one is
+        scheduled after the checkpoint interval. Without a running event loop, the
+        checkpoint is written synchronously."""
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            if self.pending_events >= self.checkpoint_events:
+                self.checkpoint()
+            return
+
+        if self.pending_events >= self.checkpoint_events:
+            self.start_checkpoint()
+            return
+
+        if self._checkpoint_handle is not None:
+            return
+
+        self._checkpoint_handle = loop.call_later(self.checkpoint_interval, self.start_checkpoint)
+
+    def start_checkpoint(self) -> None:
+        """Runs async_checkpoint in the background."""
+
+        if self._checkpoint_handle is not None:
+            self._checkpoint_handle.cancel()
+            self._checkpoint_handle = None
+
+        task = asyncio.create_task(self.async_checkpoint())
+        self._checkpoint_tasks.add(task)
+        task.add_done_callback(self._checkpoint_tasks.discard)
+
+    def _checkpoint_state(self) -> tuple[int, int] | None:
+        """Returns the ledger offset and the number of events included in a checkpoint taken
+        now and resets the pending events. Returns None, if there are no new events."""
+
+        if self._checkpoint_handle is not None:
+            self._checkpoint_handle.cancel()
+            self._checkpoint_handle = None
+
+        if not (events := self.pending_events):
+            return None
+
+        self.pending_events = 0
+
+        return (Path(self.ledger_name).stat().st_size if Path(self.ledger_name).exists() else 0), events
+
+    def checkpoint(self) -> None:
+        """Saves the balances and the ledger offset they include. Does nothing if there are
+        no new events. The snapshot is written first, so a crash in between only replays
+        events that are already part of the snapshot."""
+
+        if (state := self._checkpoint_state()) is None:
+            return
+
+        offset, events = state
+
+        save_file(self.snapshot_name, self.balances)
+        save_file(self.checkpoint_name, {"offset": offset})
+
+        logging.debug("Ledger %s checkpoint at offset %s, %s events.", self.name, offset, events)
+
+    async def async_checkpoint(self) -> None:
+        """Like checkpoint, but the files are written in the I/O thread pool. The balances
+        are serialized before the first await, so they match the offset. Checkpoints run
+        one after another, so they never write the same file at the same time."""
+
+        async with self._checkpoint_lock:
+            if (state := self._checkpoint_state()) is None:
+                return
+
+            offset, events = state
+
+            await async_save_file(self.snapshot_name, self.balances)
+            await async_save_file(self.checkpoint_name, {"offset": offset})
+
+            logging.debug("Ledger %s checkpoint at offset %s, %s events.", self.name, offset, events)
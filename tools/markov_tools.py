@@ -0,0 +1,146 @@
+"""This tool contains the markov model for the random quotes.
+
+Building the model from channel_messages.txt takes a while, so the built model is saved
+next to the corpus together with a hash of the corpus and the state size. On startup, the
+saved model is loaded and only built again, if the corpus or the state size changed.
+
+The model is saved with pickle. The chain consists of a huge number of small dicts, which
+pickle restores a lot faster than a JSON parser. The file starts with a small header, so
+an outdated model is detected without loading it. It is only ever read by the bot that
+wrote it."""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import logging
+import pickle
+import time
+from pathlib import Path
+from typing import Any, NamedTuple
+
+import markovify
+
+from tools.io_tools import run_io
+from tools.json_tools import file_stat, write_atomic
+
+MODEL_FORMAT = 1
+
+
+class MarkovModel(NamedTuple):
+    quote_by: str
+    text_model: markovify.NewlineText
+    built: bool
+
+
+def model_path(corpus_path: str) -> str:
+    return str(Path(corpus_path).with_suffix(".markov.pickle"))
+
+
+def corpus_hash(corpus_path: str) -> str:
+    digest = hashlib.sha256()
+
+    with Path(corpus_path).open("rb") as file:
+        while chunk := file.read(1_048_576):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def _read_corpus(corpus_path: str) -> list[str]:
+    with Path(corpus_path).open("r", encoding="utf-8") as file:
+        return [clean_line for line in file if (clean_line := line.strip())]
+
+
+def _load_saved(corpus_path: str, state_size: int) -> MarkovModel | None:
+    """Loads the saved model, if it was built from the current corpus with the same state
+    size. Comparing the hash is skipped, if the corpus wasn't touched since."""
+
+    if not Path(path := model_path(corpus_path)).exists():
+        return None
+
+    try:
+        with Path(path).open("rb") as file:
+            header: dict[str, Any] = pickle.load(file)  # noqa: S301
+
+            if (
+                header.get("format") != MODEL_FORMAT
+                or header.get("state_size") != state_size
+                or (
+                    file_stat(corpus_path) != header.get("corpus_stat")
+                    and corpus_hash(corpus_path) != header.get("corpus_hash")
+                )
+            ):
+                return None
+
+            chain_model, parsed_sentences = pickle.load(file)  # noqa: S301
+    except (OSError, EOFError, ValueError, TypeError, KeyError, AttributeError, pickle.UnpicklingError):
+        logging.warning("Saved markov model %s is broken, building it again.", path)
+        return None
+
+    text_model = markovify.NewlineText(
+        None,
+        state_size=state_size,
+        chain=markovify.Chain(None, state_size, model=chain_model),
+        parsed_sentences=parsed_sentences,
+    )
+
+    return MarkovModel(header["quote_by"], text_model, built=False)
+
+
+def _build(corpus_path: str, state_size: int) -> MarkovModel | None:
+    """Builds the model from the corpus and saves it. The first line of the corpus is the
+    name of the quoted person."""
+
+    if not (lines := _read_corpus(corpus_path)):
+        return None
+
+    quote_by = lines.pop(0)
+    text_model = markovify.NewlineText("\n".join(lines), state_size=state_size)
+
+    header = {
+        "format": MODEL_FORMAT,
+        "state_size": state_size,
+        "corpus_hash": corpus_hash(corpus_path),
+        "corpus_stat": file_stat(corpus_path),
+        "quote_by": quote_by,
+    }
+
+    buffer = io.BytesIO()
+    pickle.dump(header, buffer, protocol=pickle.HIGHEST_PROTOCOL)
+    pickle.dump((text_model.chain.model, text_model.parsed_sentences), buffer, protocol=pickle.HIGHEST_PROTOCOL)
+    write_atomic(model_path(corpus_path), buffer.getvalue())
+
+    return MarkovModel(quote_by, text_model, built=True)
+
+
+def _load_or_build(corpus_path: str, state_size: int, rebuild: bool) -> MarkovModel | None:  # noqa: FBT001
+    if not Path(corpus_path).exists():
+        return None
+
+    if not rebuild and (model := _load_saved(corpus_path, state_size)) is not None:
+        return model
+
+    return _build(corpus_path, state_size)
+
+
+async def load_markov_model(corpus_path: str, state_size: int = 3, *, rebuild: bool = False) -> MarkovModel | None:
+    """Returns the markov model of the corpus. The saved model is used, if it fits the
+    corpus and the state size, otherwise the model is built and saved. With rebuild, the
+    model is always built. Returns None, if the corpus is missing or empty.
+
+    Loading and building happen in the I/O thread pool."""
+
+    start = time.perf_counter()
+
+    if (model := await run_io(_load_or_build, corpus_path, state_size, rebuild)) is None:
+        return None
+
+    logging.info(
+        "Markov model %s. Size: %s Duration: %.2fs",
+        "built (cold start)" if model.built else "loaded (warm start)",
+        state_size,
+        time.perf_counter() - start,
+    )
+
+    return model
@@ -0,0 +1,88 @@
+"""This tool contains a cache for the display names of users.
+
+Leaderboards show many users at once. Their names are resolved once and cached until the
+user or member changes. If a user can't be found anymore, e.g. because they left the
+server, the last known name is used instead."""
+
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING
+
+from tools.json_tools import get_dict_file
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Mapping
+
+    from bot import Bot
+
+KNOWN_NAMES_FLUSH_INTERVAL = 60.0
+
+
+class NameResolver:
+    """Resolves user IDs to display names. The nickname on the server is preferred over
+    the global name. Resolved names are cached and also saved as last known names."""
+
+    def __init__(self, bot: Bot, path: str = "json/") -> None:
+        self.bot = bot
+        self.names: dict[int, str] = {}
+        self.hits = 0
+        self.misses = 0
+
+        self.known_names = get_dict_file(
+            "names",
+            path=path,
+            write_behind=True,
+            flush_interval=KNOWN_NAMES_FLUSH_INTERVAL,
+            journal=True,
+            default={},
+        )
+
+    def lookup(self, user_id: int) -> str | None:
+        """Looks up the current display name of a user in the cache of discord.py."""
+
+        if (guild := self.bot.get_guild(int(self.bot.settings["server_id"]))) is not None and (
+            member := guild.get_member(user_id)
+        ) is not None:
+            return member.display_name
+
+        if (user := self.bot.get_user(user_id)) is not None:
+            return user.display_name
+
+        return None
+
+    def resolve(self, user_id: int | str, fallback: str | None = None) -> str:
+        """Returns the display name of a user. If the user can't be found, the given
+        fallback, the last known name or the ID is returned, in this order."""
+
+        user_id = int(user_id)
+
+        if (name := self.names.get(user_id)) is not None:
+            self.hits += 1
+            return name
+
+        self.misses += 1
+
+        if (name := self.lookup(user_id)) is None:
+            return fallback or self.known_names.get(str(user_id)) or str(user_id)
+
+        self.names[user_id] = name
+
+        if self.known_names.get(str(user_id)) != name:
+            self.known_names[str(user_id)] = name
+
+        return name
+
+    def resolve_many(self, user_ids: Iterable[int | str], fallbacks: Mapping[str, str] | None = None) -> list[str]:
+        """Resolves several users at once, e.g. a page of a leaderboard. Fallback names
+        are looked up by the ID as string."""
+
+        fallbacks = fallbacks or {}
+
+        return [self.resolve(user_id, fallbacks.get(str(user_id))) for user_id in user_ids]
+
+    def invalidate(self, user_id: int) -> None:
+        """Removes a user from the cache, so the name is looked up again next time."""
+
+        if self.names.pop(user_id, None) is not None:
+            logging.debug("Cached name of %s invalidated.", user_id)
@@ -0,0 +1,244 @@
+"""This tool contains the in-memory state of running polls and the archive of closed ones.
+
+Every poll keeps a tally of its votes, so a click only changes one counter instead of
+counting all votes again. The votes themselves stay in the poll store, which persists
+the changed entry in the background. Closed polls are moved to the archive, so the poll
+store only contains the running ones."""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import os
+from collections import Counter
+from enum import StrEnum
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from tools.json_tools import CODEC, get_dict_file
+from tools.schema_tools import Poll, PollIndex
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable, Mapping
+
+    from tools.json_tools import DictFile
+
+
+class PollStatus(StrEnum):
+    """States of a poll. Polls without a state are active."""
+
+    ACTIVE = "active"
+    CLOSED = "closed"
+
+
+def count_votes(votes: dict[str, list[str]]) -> Counter[str]:
+    """Counts the votes of every choice of a poll."""
+
+    return Counter(choice for row in votes.values() for choice in row)
+
+
+class PollState:
+    """Represents a poll in memory. Holds the tally of the votes. A vote is toggled
+    without awaiting anything, so clicks are atomic on the event loop and need no lock.
+    Once the poll is stopped, further clicks are ignored.
+
+    Edits of the poll message are coalesced: the first request is edited right away, all
+    requests within the following interval are combined into a single edit."""
+
+    def __init__(self, polls: DictFile, poll_id: str) -> None:
+        self.polls = polls
+        self.poll_id = poll_id
+        self.stopped = False
+        self.recount()
+
+        self.edits_requested = 0
+        self.edits_done = 0
+        self._edit: Callable[[], Awaitable[None]] | None = None
+        self._edit_task: asyncio.Task | None = None
+
+    def recount(self) -> None:
+        """Counts the votes of the poll from scratch."""
+
+        self.votes: dict[str, list[str]] = self.polls[self.poll_id]["votes"]
+        self.tally = count_votes(self.votes)
+
+    @property
+    def outdated(self) -> bool:
+        """Is True, if the poll store was reloaded and the tally has to be recounted."""
+
+        return self.polls[self.poll_id]["votes"] is not self.votes
+
+    @property
+    def choices(self) -> dict[str, str]:
+        return self.polls[self.poll_id]["choices"]
+
+    @property
+    def vote_counts(self) -> dict[str, int]:
+        """Returns the number of votes per choice in the order of the choices."""
+
+        return {choice_id: self.tally[choice_id] for choice_id in self.choices}
+
+    def toggle_vote(self, user_id: str, choice_id: str) -> bool:
+        """Adds the vote of a user for a choice or takes it back, if it was already given.
+
+        Returns:
+            bool: True, if the vote was added."""
+
+        if user_id not in self.votes:
+            self.votes[user_id] = [choice_id]
+        elif choice_id not in self.votes[user_id]:
+            self.votes[user_id].append(choice_id)
+        else:
+            self.votes[user_id].remove(choice_id)
+            self.tally[choice_id] -= 1
+
+            logging.debug("Poll %s: %s took back the vote for %s.", self.poll_id, user_id, choice_id)
+            return False
+
+        self.tally[choice_id] += 1
+
+        logging.debug("Poll %s: %s voted for %s.", self.poll_id, user_id, choice_id)
+        return True
+
+    @property
+    def edits_saved(self) -> int:
+        return self.edits_requested - self.edits_done
+
+    def request_edit(self, edit: Callable[[], Awaitable[None]], interval: float) -> None:
+        """Requests an edit of the poll message. The edit is awaited right away, if there
+        was none within the interval, otherwise only the latest request is awaited once
+        the interval has passed."""
+
+        self.edits_requested += 1
+        self._edit = edit
+
+        if self._edit_task is None:
+            self._edit_task = asyncio.create_task(self._run_edits(interval))
+
+    async def _run_edits(self, interval: float) -> None:
+        try:
+            while (edit := self._edit) is not None:
+                self._edit = None
+
+                await edit()
+                self.edits_done += 1
+
+                await asyncio.sleep(interval)
+        finally:
+            self._edit_task = None
+
+    async def cancel_edits(self) -> None:
+        """Cancels pending edits, e.g. before the buttons of the poll are deactivated."""
+
+        self._edit = None
+
+        if (task := self._edit_task) is None:
+            return
+
+        task.cancel()
+
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+
+class PollStates:
+    """Holds the states of the polls. A state is created when its poll is used first."""
+
+    def __init__(self) -> None:
+        self.states: dict[str, PollState] = {}
+
+    def get(self, polls: DictFile, poll_id: str) -> PollState:
+        """Returns the state of a poll. The votes are recounted, if the poll store was
+        reloaded since they were counted.
+
+        Raises:
+            KeyError: When the poll doesn't exist."""
+
+        if (state := self.states.get(poll_id)) is None or state.polls is not polls:
+            state = self.states[poll_id] = PollState(polls, poll_id)
+        elif state.outdated:
+            state.recount()
+
+        return state
+
+    def discard(self, poll_id: str) -> None:
+        """Removes the state of a poll, e.g. when it was stopped."""
+
+        if (state := self.states.pop(poll_id, None)) is not None:
+            self.log_edits(state)
+
+    @staticmethod
+    def log_edits(state: PollState) -> None:
+        logging.info(
+            "Poll %s: %s message edits requested, %s done, %s saved.",
+            state.poll_id,
+            state.edits_requested,
+            state.edits_done,
+            state.edits_saved,
+        )
+
+    async def close(self) -> None:
+        """Cancels the pending edits of all polls and logs how many edits were saved."""
+
+        for state in self.states.values():
+            await state.cancel_edits()
+            self.log_edits(state)
+
+        self.states.clear()
+
+
+class PollArchive:
+    """Append-only archive of closed polls. Every poll is appended as one compact line to
+    the archive file. The index keeps the position of every line, so a single poll can be
+    read without loading the whole archive. The index also holds the counter of the poll
+    IDs, which only ever increases."""
+
+    def __init__(self, polls: Mapping[str, Poll], name: str = "polls", path: str = "json/") -> None:
+        self.file_name = f"{path}{name}_archive.jsonl"
+
+        self.index = get_dict_file(
+            f"{name}_index",
+            path=path,
+            journal=True,
+            schema=PollIndex,
+            default={"next_id": max(map(int, polls), default=-1) + 1, "archive": {}},
+        )
+
+    def __contains__(self, poll_id: object) -> bool:
+        return poll_id in self.index["archive"]
+
+    def allocate_id(self) -> str:
+        """Returns a new poll ID without looking at the existing polls."""
+
+        poll_id = self.index["next_id"]
+        self.index["next_id"] = poll_id + 1
+
+        return str(poll_id)
+
+    def add(self, poll_id: str, poll: Poll) -> None:
+        """Appends a closed poll to the archive and adds its position to the index."""
+
+        record = CODEC.encode({"id": poll_id, **poll, "state": PollStatus.CLOSED}, None) + b"\n"
+
+        with Path(self.file_name).open("ab") as file:
+            offset = file.seek(0, os.SEEK_END)
+            file.write(record)
+            file.flush()
+            os.fsync(file.fileno())
+
+        self.index["archive"][poll_id] = [offset, len(record)]
+
+        logging.info("Poll %s archived.", poll_id)
+
+    def get(self, poll_id: str) -> Poll | None:
+        """Reads a single poll from the archive. Returns None, if it wasn't archived."""
+
+        if (position := self.index["archive"].get(poll_id)) is None:
+            return None
+
+        offset, length = position
+
+        with Path(self.file_name).open("rb") as file:
+            file.seek(offset)
+            return CODEC.decode(file.read(length), Poll)
@@ -0,0 +1,339 @@
+"""This tool contains helpers for the quiz questions.
+
+The questions are loaded once and converted into immutable tuples, which take less
+memory than the decoded JSON and can be shared by all games. They are sorted into one
+bucket per stage when they are loaded, so drawing a question for a stage doesn't have
+to search through all questions.
+
+Within a game, the questions of a stage are dealt from a shuffle bag. Questions fit into
+several stages, so the game also remembers every question it asked and skips it in later
+stages. A question is only asked twice, once all questions of a stage were asked.
+
+Every channel can run its own game. The games are kept in a session manager, so a message
+only needs a single lookup to find its game."""
+
+from __future__ import annotations
+
+import logging
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from tools.json_tools import async_load_file, file_stat
+from tools.schema_tools import QuizData
+
+if TYPE_CHECKING:
+    import discord
+
+    from tools.schema_tools import Question
+
+STAGES = [
+    50,
+    100,
+    200,
+    300,
+    500,
+    1000,
+    2000,
+    4000,
+    8000,
+    16000,
+    32000,
+    64000,
+    125000,
+    250000,
+    500000,
+    1000000,
+]
+
+
+class CompactAnswer(NamedTuple):
+    text: str
+    correct: bool
+
+
+class CompactQuestion(NamedTuple):
+    question: str
+    category: str
+    low: int
+    high: int
+    answers: tuple[CompactAnswer, ...]
+
+
+def compact_question(question: Question) -> CompactQuestion:
+    """Converts a question of the quiz file into its compact form. The categories are
+    interned, because many questions share them."""
+
+    low, high = question["range"]
+
+    return CompactQuestion(
+        question["question"],
+        sys.intern(question["category"]),
+        low,
+        high,
+        tuple(CompactAnswer(answer["text"], answer["correct"]) for answer in question["answers"]),
+    )
+
+
+class QuestionIndex:
+    """Questions grouped by the stages they fit into. A question fits into every stage
+    whose points are within the range of the question. The buckets hold the positions of
+    their questions, so a question can be recognized in every bucket."""
+
+    def __init__(self, questions: list[CompactQuestion], stages: list[int] = STAGES) -> None:
+        self.stages = stages
+        self.questions = tuple(questions)
+        self.question_count = len(questions)
+        self.buckets: list[tuple[int, ...]] = [
+            tuple(position for position, question in enumerate(questions) if question.low <= stage <= question.high)
+            for stage in stages
+        ]
+
+        if empty_stages := self.empty_stages:
+            logging.warning("No quiz questions for the stages %s.", ", ".join(map(str, empty_stages)))
+
+        logging.info(
+            "Quiz question index built. %s questions, between %s and %s per stage.",
+            len(questions),
+            min(map(len, self.buckets), default=0),
+            max(map(len, self.buckets), default=0),
+        )
+
+    @property
+    def empty_stages(self) -> list[int]:
+        return [stage for stage, bucket in zip(self.stages, self.buckets, strict=True) if not bucket]
+
+
+class ShuffleBag:
+    """Deals the numbers 0 to size - 1 in random order, each once, before starting over.
+
+    The permutation is built lazily: only the positions that were swapped are stored, so
+    creating a bag and dealing a number both take O(1), even for large buckets."""
+
+    def __init__(self, size: int, rng: random.Random) -> None:
+        self.size = size
+        self.rng = rng
+        self.remaining = size
+        self._swapped: dict[int, int] = {}
+
+    def deal(self) -> int | None:
+        """Returns the next number. Returns None, if the bag is empty."""
+
+        if not self.size:
+            return None
+
+        if not self.remaining:
+            self.restart()
+
+        position = self.rng.randrange(self.remaining)
+        self.remaining -= 1
+
+        dealt = self._swapped.get(position, position)
+        last = self._swapped.pop(self.remaining, self.remaining)
+
+        if position != self.remaining:
+            self._swapped[position] = last
+
+        return dealt
+
+    def restart(self) -> None:
+        """Starts a new round, in which every number is dealt again."""
+
+        self.remaining = self.size
+        self._swapped.clear()
+
+
+class QuestionDeck:
+    """The questions of one game. Every stage has its own shuffle bag over the bucket of
+    the stage. Questions that were already asked in an earlier stage are skipped. If all
+    questions of a stage were asked, the stage starts over."""
+
+    def __init__(self, rng: random.Random) -> None:
+        self.rng = rng
+        self.index: QuestionIndex | None = None
+        self.bags: dict[int, ShuffleBag] = {}
+        self.dealt: set[int] = set()
+
+    def deal(self, index: QuestionIndex, stage_index: int) -> CompactQuestion | None:
+        """Deals a question for the stage with the given index. Returns None, if there is
+        no question for the stage."""
+
+        if index is not self.index:
+            self.index = index
+            self.bags.clear()
+            self.dealt.clear()
+
+        bucket = index.buckets[stage_index]
+
+        if (bag := self.bags.get(stage_index)) is None:
+            bag = self.bags[stage_index] = ShuffleBag(len(bucket), self.rng)
+
+        if (position := self._deal_unused(bag, bucket)) is None:
+            if not bucket:
+                return None
+
+            logging.debug("All %s questions of stage %s were asked, starting over.", len(bucket), stage_index)
+
+            self.dealt.difference_update(bucket)
+            bag.restart()
+
+            if (position := self._deal_unused(bag, bucket)) is None:
+                return None
+
+        self.dealt.add(question_index := bucket[position])
+
+        return index.questions[question_index]
+
+    def _deal_unused(self, bag: ShuffleBag, bucket: tuple[int, ...]) -> int | None:
+        """Deals positions from the current round of the bag until one of a question that
+        wasn't asked yet comes up. Returns None, if the round ends before."""
+
+        while bag.remaining:
+            if (position := bag.deal()) is not None and bucket[position] not in self.dealt:
+                return position
+
+        return None
+
+
+def shuffled_answers(question: CompactQuestion, rng: random.Random) -> list[CompactAnswer]:
+    """Returns the answers of a question in random order. The question itself is shared
+    by all games and stays as it is."""
+
+    return rng.sample(question.answers, len(question.answers))
+
+
+def deep_size(obj: object, seen: set[int] | None = None) -> int:
+    """Estimates the memory used by the compact questions, including their strings.
+    Shared objects like the interned categories are only counted once."""
+
+    seen = set() if seen is None else seen
+
+    if id(obj) in seen:
+        return 0
+
+    seen.add(id(obj))
+
+    if isinstance(obj, tuple):
+        return sys.getsizeof(obj) + sum(deep_size(item, seen) for item in obj)
+
+    return sys.getsizeof(obj)
+
+
+class QuizDataset:
+    """The questions of the quiz file and their index. They are loaded once and only
+    loaded again, if the file was changed or a reload is forced."""
+
+    def __init__(self, file_path: str = "json/quiz.json", stages: list[int] = STAGES) -> None:
+        self.file_path = file_path
+        self.stages = stages
+        self.index: QuestionIndex | None = None
+        self.disk_state: tuple[int, int] | None = None
+
+    async def load(self) -> QuestionIndex:
+        """Loads the questions, converts them into their compact form and builds the index."""
+
+        start = time.perf_counter()
+        disk_state = file_stat(self.file_path)
+
+        quiz = await async_load_file(self.file_path, schema=QuizData)
+
+        if not isinstance(quiz, list):
+            msg = "Quiz file has to contain a list of questions."
+            raise TypeError(msg)
+
+        questions = [compact_question(question) for question in quiz]
+        self.index = QuestionIndex(questions, self.stages)
+        self.disk_state = disk_state
+
+        logging.info(
+            "Quiz loaded in %.1f ms. %s questions use about %s KB.",
+            (time.perf_counter() - start) * 1000,
+            len(questions),
+            (deep_size(tuple(questions)) + deep_size(tuple(self.index.buckets))) // 1024,
+        )
+
+        return self.index
+
+    async def get_index(self) -> QuestionIndex:
+        """Returns the index of the questions. Loads them first, if they weren't loaded yet
+        or the file changed since then."""
+
+        if self.index is None or file_stat(self.file_path) != self.disk_state:
+            return await self.load()
+
+        return self.index
+
+
+@dataclass
+class QuizSession:
+    """State of a single game. Each channel can have its own game."""
+
+    player: discord.Member
+    channel: discord.TextChannel
+    game_stage: int = 0
+    question: dict[str, Any] = field(default_factory=dict)
+    deck: QuestionDeck = field(default_factory=lambda: QuestionDeck(random.Random()))  # noqa: S311
+    last_activity: float = field(default_factory=time.monotonic)
+
+    @property
+    def rng(self) -> random.Random:
+        return self.deck.rng
+
+    def touch(self) -> None:
+        self.last_activity = time.monotonic()
+
+
+class QuizSessions:
+    """The running games, keyed by the ID of their channel. The number of games is capped
+    and games without any activity for idle_timeout seconds can be expired."""
+
+    def __init__(self, max_sessions: int = 10, idle_timeout: float = 600.0, seed: int | None = None) -> None:
+        """The seed makes the questions of all games reproducible, e.g. for simulations."""
+
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.sessions: dict[int, QuizSession] = {}
+        self.rng = random.Random(seed)  # noqa: S311
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def get(self, channel_id: int) -> QuizSession | None:
+        return self.sessions.get(channel_id)
+
+    @property
+    def is_full(self) -> bool:
+        return len(self.sessions) >= self.max_sessions
+
+    def start(self, player: discord.Member, channel: discord.TextChannel) -> QuizSession | None:
+        """Starts a game in the channel. Returns None, if the channel already has a game or
+        the maximum number of games is reached."""
+
+        if channel.id in self.sessions or self.is_full:
+            return None
+
+        deck = QuestionDeck(random.Random(self.rng.getrandbits(64)))  # noqa: S311
+        session = self.sessions[channel.id] = QuizSession(player, channel, deck=deck)
+        logging.debug("Quiz session in %s started, %s running.", channel.id, len(self.sessions))
+
+        return session
+
+    def end(self, session: QuizSession) -> None:
+        if self.sessions.get(session.channel.id) is session:
+            del self.sessions[session.channel.id]
+
+    def expire(self, now: float | None = None) -> list[QuizSession]:
+        """Ends all games that were idle for too long and returns them."""
+
+        now = time.monotonic() if now is None else now
+        expired = [session for session in self.sessions.values() if now - session.last_activity > self.idle_timeout]
+
+        for session in expired:
+            self.end(session)
+
+        if expired:
+            logging.info("%s idle quiz sessions expired, %s running.", len(expired), len(self.sessions))
+
+        return expired
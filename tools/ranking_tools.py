@@ -0,0 +1,62 @@
+"""This tool contains the ranking of the quiz.
+
+The ranking is kept in memory and every finished game is recorded with a single upsert.
+The changes are collected and appended to a journal in the background, so finishing a
+game doesn't write the ranking file. Recording a game doesn't await anything, so games
+that finish at the same time can't overwrite each other's results."""
+
+from __future__ import annotations
+
+import logging
+
+from tools.json_tools import get_dict_file
+from tools.leaderboard_tools import Leaderboard
+from tools.schema_tools import RankingEntry, RankingStore
+
+RANKING_FLUSH_INTERVAL = 30.0
+
+
+class QuizRanking:
+    """Points and tries of every player of the quiz, ranked in a leaderboard."""
+
+    def __init__(self, name: str = "quiz_ranking", path: str = "json/") -> None:
+        self.entries = get_dict_file(
+            name,
+            path=path,
+            write_behind=True,
+            flush_interval=RANKING_FLUSH_INTERVAL,
+            journal=True,
+            schema=RankingStore,
+            default={},
+        )
+        self.leaderboard = Leaderboard((player_id, entry["points"]) for player_id, entry in self.entries.items())
+
+        logging.info("Quiz ranking loaded with %s players.", len(self.entries))
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, player_id: object) -> bool:
+        return player_id in self.entries
+
+    def get(self, player_id: str) -> RankingEntry:
+        """Returns the entry of a player. Players who never played get an empty entry."""
+
+        return self.entries.get(player_id) or {"name": "", "points": 0, "tries": 0}
+
+    def record(self, player_id: str, name: str, points: int) -> RankingEntry:
+        """Adds the points of a finished game and counts it as a try. Creates the entry of
+        new players. Returns the updated entry."""
+
+        entry = self.get(player_id)
+        self.entries[player_id] = entry = {
+            "name": name,
+            "points": entry["points"] + points,
+            "tries": entry["tries"] + 1,
+        }
+        self.leaderboard.update(player_id, entry["points"])
+
+        return entry
+
+    def flush(self) -> None:
+        self.entries.flush()
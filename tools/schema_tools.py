@@ -0,0 +1,99 @@
+"""This tool contains the typed schemas of the JSON-files in the json directory.
+
+Files loaded with one of these schemas are validated while they are decoded. Keys that are
+not part of a schema are dropped, unless the schema is marked with KeepExtraKeys. The
+settings are marked, so a setting that isn't part of the Settings schema yet is kept and
+only logged."""
+
+from __future__ import annotations
+
+from typing import Annotated, Any, NotRequired, TypedDict
+
+Settings = TypedDict(
+    "Settings",
+    {
+        "server_id": str | int,
+        "channels": dict[str, str],
+        "super-users": list[str],
+        "faith_on_react": int,
+        "faith_by_command": dict[str, int],
+        "poll_edit_interval": float,
+        "quiz_max_sessions": int,
+        "quiz_idle_timeout": float,
+    },
+    total=False,
+)
+
+
+class KeepExtraKeys:
+    """Marks a TypedDict schema with Annotated, whose file may contain keys that aren't part
+    of it. The known keys are validated, the other keys are kept as they are."""
+
+
+SettingsFile = Annotated[Settings, KeepExtraKeys]
+
+
+# Functional syntax, because NotRequired isn't detected in postponed annotations.
+Poll = TypedDict(  # noqa: UP013
+    "Poll",
+    {
+        "title": str,
+        "description": str | None,
+        "choices": dict[str, str],
+        "votes": dict[str, list[str]],
+        "message_id": NotRequired[str],
+        "state": NotRequired[str],
+    },
+)
+
+
+class PollIndex(TypedDict):
+    next_id: int
+    archive: dict[str, list[int]]
+
+
+class RankingEntry(TypedDict):
+    name: str
+    points: int
+    tries: int
+
+
+JournalRecord = TypedDict(  # noqa: UP013
+    "JournalRecord",
+    {
+        "op": str,
+        "path": list[str],
+        "value": NotRequired[Any],
+    },
+)
+
+
+class LedgerEvent(TypedDict):
+    timestamp: float
+    member: str
+    delta: int
+    reason: str
+    balance: int
+
+
+class LedgerCheckpoint(TypedDict):
+    offset: int
+
+
+class Answer(TypedDict):
+    text: str
+    correct: bool
+
+
+class Question(TypedDict):
+    question: str
+    category: str
+    range: list[int]
+    answers: list[Answer]
+
+
+FaithStore = dict[str, int]
+SquadStore = dict[str, dict[str, int]]
+PollStore = dict[str, Poll]
+RankingStore = dict[str, RankingEntry]
+QuizData = list[Question]
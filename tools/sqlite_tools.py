@@ -0,0 +1,385 @@
+"""This tool contains a DictFile compatible mapping that stores its data in a SQLite database.
+
+All stores share one database file. Every store gets its own table with one row per
+top-level key, so reading or updating a single key doesn't depend on the size of the store.
+
+The stores of a database also share its connection and with it the running transaction.
+Changes of other tasks are held back while a transaction is running and written once it
+has ended, so they are neither committed nor rolled back together with it.
+
+The existing JSON-files can be imported once with:
+    python -m tools.sqlite_tools
+
+Nothing uses this backend yet. get_dict_file always returns the JSON DictFile and there is
+no setting to switch, so the imported database isn't read by the bot."""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import re
+import sqlite3
+from collections.abc import AsyncIterator, Iterator, MutableMapping
+from pathlib import Path
+from typing import Any
+
+from tools.json_tools import CODEC, DictFile, DictFileLoadError, KeyPath, track
+from tools.ledger_tools import Ledger
+
+DEFAULT_DB_PATH = "json/moevius.sqlite3"
+
+_CONNECTIONS: dict[str, SharedConnection] = {}
+
+
+class StoreNameError(ValueError):
+    pass
+
+
+class SharedConnection:
+    """Connection to a database together with the state of its running transaction."""
+
+    def __init__(self, db_path: str) -> None:
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        self.connection = sqlite3.connect(db_path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+
+        self.lock = asyncio.Lock()
+        self.transaction_task: asyncio.Task | None = None
+        self.touched: dict[int, SQLiteDictFile] = {}
+        self.deferred: dict[int, SQLiteDictFile] = {}
+        self.created_tables: set[str] = set()
+
+    @property
+    def in_transaction(self) -> bool:
+        return self.transaction_task is not None
+
+    def is_foreign(self) -> bool:
+        """Is True, if a transaction is running and it belongs to another task."""
+
+        if self.transaction_task is None:
+            return False
+
+        try:
+            return asyncio.current_task() is not self.transaction_task
+        except RuntimeError:
+            return True
+
+    def create_table(self, table: str) -> None:
+        """Creates the table of a store, if it doesn't exist yet. During a transaction, the
+        table is created as part of it instead of committing the transaction early."""
+
+        self.connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID"
+        )
+
+        if self.in_transaction:
+            self.created_tables.add(table)
+        else:
+            self.connection.commit()
+
+    def restore_tables(self) -> None:
+        """Creates the tables again that were created during a rolled back transaction,
+        because their stores still exist."""
+
+        tables = self.created_tables
+        self.created_tables = set()
+
+        for table in tables:
+            self.create_table(table)
+
+    def write_deferred(self) -> None:
+        """Writes the changes that were held back during the transaction."""
+
+        stores = list(self.deferred.values())
+        self.deferred.clear()
+
+        for store in stores:
+            store.write_deferred()
+
+        if stores:
+            self.connection.commit()
+
+
+def get_shared_connection(db_path: str = DEFAULT_DB_PATH) -> SharedConnection:
+    """Returns the shared connection to the database under the given path. The database
+    is created in WAL mode, if it doesn't exist yet."""
+
+    if (shared := _CONNECTIONS.get(db_path)) is not None:
+        return shared
+
+    shared = _CONNECTIONS[db_path] = SharedConnection(db_path)
+    logging.info("SQLite database %s opened.", db_path)
+
+    return shared
+
+
+def get_connection(db_path: str = DEFAULT_DB_PATH) -> sqlite3.Connection:
+    return get_shared_connection(db_path).connection
+
+
+def close_connections() -> None:
+    """Closes all shared database connections."""
+
+    for shared in _CONNECTIONS.values():
+        shared.connection.close()
+
+    _CONNECTIONS.clear()
+
+
+class SQLiteDictFile(MutableMapping[str, Any]):
+    """Mapping with the same interface as DictFile that stores every top-level key as a
+    row in its own table. Values are loaded lazily per key and cached afterwards. Nested
+    changes are tracked like in DictFile and only rewrite the row of their top-level key."""
+
+    def __init__(self, name: str, /, db_path: str = DEFAULT_DB_PATH) -> None:
+        if not re.fullmatch(r"\w+", name):
+            msg = f"Invalid store name: {name}"
+            raise StoreNameError(msg)
+
+        self.name = name
+        self.table = f'"store_{name}"'
+        self.shared = get_shared_connection(db_path)
+        self.connection = self.shared.connection
+        self._cache: dict[str, Any] = {}
+        self._deferred: dict[str, bool] = {}
+
+        self.shared.create_table(self.table)
+
+        logging.info("SQLiteDictFile %s initialized succesfully.", name)
+
+    def _decode(self, key: str, value: str) -> Any:  # noqa: ANN401
+        return self._cache.setdefault(key, track(CODEC.decode(value.encode()), self, (key,)))
+
+    def _defer(self, key: str, *, exists: bool) -> bool:
+        """Holds back the change of a key, if another task runs a transaction. Otherwise
+        remembers that the store took part in the running transaction.
+
+        Returns:
+            bool: Is True, if the change was held back."""
+
+        if self.shared.is_foreign():
+            self._deferred[key] = exists
+            self.shared.deferred[id(self)] = self
+            return True
+
+        if self.shared.in_transaction:
+            self.shared.touched[id(self)] = self
+
+        return False
+
+    def _write(self, key: str) -> None:
+        if self._defer(key, exists=True):
+            return
+
+        self.connection.execute(
+            f"INSERT OR REPLACE INTO {self.table} (key, value) VALUES (?, ?)",  # noqa: S608
+            (key, CODEC.encode(self._cache[key], None).decode()),
+        )
+        self._commit()
+
+    def _commit(self) -> None:
+        if not self.shared.in_transaction:
+            self.connection.commit()
+
+    def write_deferred(self) -> None:
+        """Writes the changes that were held back during a transaction of another task."""
+
+        deferred = self._deferred
+        self._deferred = {}
+
+        for key, exists in deferred.items():
+            if not exists:
+                self.connection.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))  # noqa: S608
+            elif key in self._cache:
+                self.connection.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value) VALUES (?, ?)",  # noqa: S608
+                    (key, CODEC.encode(self._cache[key], None).decode()),
+                )
+
+    def discard_cache(self) -> None:
+        """Drops the cached values after a rollback. Values of changes that are still held
+        back are kept, because they only exist in the cache."""
+
+        self._cache = {key: self._cache[key] for key in self._deferred if key in self._cache}
+
+    def __getitem__(self, __key: str) -> Any:  # noqa: ANN401
+        if __key in self._cache:
+            return self._cache[__key]
+
+        if self._deferred.get(__key) is False:
+            raise KeyError(__key)
+
+        row = self.connection.execute(
+            f"SELECT value FROM {self.table} WHERE key = ?",  # noqa: S608
+            (__key,),
+        ).fetchone()
+
+        if row is None:
+            raise KeyError(__key)
+
+        return self._decode(__key, row[0])
+
+    def __setitem__(self, __key: str, __value: Any) -> None:  # noqa: ANN401
+        self._cache[__key] = track(__value, self, (__key,))
+
+        logging.debug("SQLiteDictFile %s item set. %s: %s", self.name, __key, __value)
+
+        self._write(__key)
+
+    def __delitem__(self, __key: str) -> None:
+        if self.shared.is_foreign():
+            if __key not in self:
+                raise KeyError(__key)
+
+            self._cache.pop(__key, None)
+            self._defer(__key, exists=False)
+            return
+
+        self._defer(__key, exists=False)
+        self._cache.pop(__key, None)
+        self._deferred.pop(__key, None)
+
+        cursor = self.connection.execute(f"DELETE FROM {self.table} WHERE key = ?", (__key,))  # noqa: S608
+        self._commit()
+
+        if not cursor.rowcount:
+            raise KeyError(__key)
+
+        logging.debug("SQLiteDictFile %s item deleted. %s", self.name, __key)
+
+    def __contains__(self, __key: object) -> bool:
+        if __key in self._cache:
+            return True
+
+        if self._deferred.get(__key) is False:  # type: ignore[call-overload]
+            return False
+
+        row = self.connection.execute(f"SELECT 1 FROM {self.table} WHERE key = ?", (__key,)).fetchone()  # noqa: S608
+
+        return row is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter([row[0] for row in self.connection.execute(f"SELECT key FROM {self.table}")])  # noqa: S608
+
+    def __len__(self) -> int:
+        return self.connection.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]  # noqa: S608
+
+    def items(self) -> list[tuple[str, Any]]:  # type: ignore[override]
+        """Returns all items with a single query instead of one query per key."""
+
+        rows = self.connection.execute(f"SELECT key, value FROM {self.table}").fetchall()  # noqa: S608
+
+        return [(key, self._cache[key] if key in self._cache else self._decode(key, value)) for key, value in rows]
+
+    def values(self) -> list[Any]:  # type: ignore[override]
+        return [value for _, value in self.items()]
+
+    def update(self, __m=(), **kwargs) -> None:  # noqa: ANN001, ANN003
+        """Sets multiple keys within a single transaction."""
+
+        new_items = dict(__m, **kwargs)
+        self._cache.update({key: track(value, self, (key,)) for key, value in new_items.items()})
+
+        if [key for key in new_items if self._defer(key, exists=True)]:
+            return
+
+        self.connection.executemany(
+            f"INSERT OR REPLACE INTO {self.table} (key, value) VALUES (?, ?)",  # noqa: S608
+            [(key, CODEC.encode(self._cache[key], None).decode()) for key in new_items],
+        )
+        self._commit()
+
+        logging.debug("SQLiteDictFile %s updated", self.name)
+
+    @contextlib.asynccontextmanager
+    async def transaction(self) -> AsyncIterator[SQLiteDictFile]:
+        """Applies several changes within a single database transaction. Works like
+        DictFile.transaction, but the lock belongs to the shared connection, so only one
+        transaction runs per database. Changes of the same task to other stores of the
+        database become part of the transaction, changes of other tasks are written after it."""
+
+        shared = self.shared
+
+        if (task := asyncio.current_task()) is not None and task is shared.transaction_task:
+            yield self
+            return
+
+        async with shared.lock:
+            shared.transaction_task = task
+            shared.touched = {id(self): self}
+
+            try:
+                yield self
+            except BaseException:
+                self.connection.rollback()
+                shared.transaction_task = None
+                shared.restore_tables()
+
+                for store in shared.touched.values():
+                    store.discard_cache()
+
+                raise
+            else:
+                self.connection.commit()
+            finally:
+                shared.transaction_task = None
+                shared.touched = {}
+                shared.created_tables = set()
+                shared.write_deferred()
+
+    def before_change(self, path: KeyPath) -> None:
+        """Changes are undone by the database, so there is nothing to remember."""
+
+    def persist_path(self, path: KeyPath) -> None:
+        """Rewrites the row of the top-level key of a changed nested value."""
+
+        if path[0] in self._cache:
+            self._write(path[0])
+
+    def flush(self) -> None:
+        """Every change is committed right away. Exists for compatibility with DictFile."""
+
+    def save(self) -> None:
+        """Every change is committed right away. Exists for compatibility with DictFile."""
+
+
+def import_json_stores(json_path: str = "json/", db_path: str = DEFAULT_DB_PATH) -> dict[str, int]:
+    """Imports every JSON-file in the given directory that contains a dict into its own
+    table of the database. Journals are replayed before importing. Stores with a ledger,
+    like faith, are imported with the balances after replaying the ledger, because their
+    JSON-file is only the last checkpoint. Files that contain something else, like the
+    quiz questions, and files whose name isn't a valid store name are skipped.
+
+    Returns:
+        dict[str, int]: Number of imported keys per store."""
+
+    imported = {}
+
+    for file in sorted(Path(json_path).glob("*.json")):
+        if not re.fullmatch(r"\w+", file.stem):
+            logging.warning("Skipped %s, %s is no valid store name.", file.name, file.stem)
+            continue
+
+        try:
+            if Path(f"{json_path}{file.stem}_ledger.jsonl").exists():
+                content: dict[str, Any] = Ledger(file.stem, path=json_path).balances
+            else:
+                content = DictFile(file.stem, path=json_path, journal=True)
+        except (DictFileLoadError, ValueError):
+            logging.warning("Skipped %s, it doesn't contain a dict.", file.name)
+            continue
+
+        SQLiteDictFile(file.stem, db_path=db_path).update(content)
+
+        imported[file.stem] = len(content)
+        logging.info("Imported %s keys from %s.", len(content), file.name)
+
+    return imported
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    import_json_stores()
@@ -2,10 +2,19 @@
 
 from __future__ import annotations
 
+from collections.abc import Awaitable, Callable
+from typing import TYPE_CHECKING
+
 import discord
 
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+
 Choice = tuple[str, str]
 Choices = list[Choice]
+PollHandler = Callable[[discord.Interaction, str], Awaitable[None]]
+
+POLL_NAMESPACE = "moevius:poll"
 
 
 def emoji_from_asciilo(ch: str) -> str:
@@ -14,10 +23,13 @@ def emoji_from_asciilo(ch: str) -> str:
 
 
 class PollView(discord.ui.View):
-    """Represents a special discord view that contains buttons for polls."""
+    """Represents a special discord view that contains buttons for polls. The view is
+    persistent, clicks on its buttons are passed to the handler together with the part
+    of the custom_id after the poll namespace."""
 
-    def __init__(self) -> None:
+    def __init__(self, handler: PollHandler | None = None) -> None:
         super().__init__(timeout=None)
+        self.handler = handler
 
     def buttons_from_choices(self, new_poll_id: str, choices: Choices) -> PollView:
         """Populates the view with buttons from a list of choices. Returns itself for daisy chaining."""
@@ -28,26 +40,21 @@ class PollView(discord.ui.View):
         return self
 
     def buttons_from_collection(
-        self, choices: dict[str, str], votes: dict[str, list], poll_id: str, iteration: int
+        self, choices: dict[str, str], vote_counts: Mapping[str, int], poll_id: str
     ) -> PollView:
-        """Populates the view with buttons from a collection. Returns itself for daisy chaining."""
+        """Populates the view with buttons from a collection and the number of votes per
+        choice. Returns itself for daisy chaining."""
 
         for choice in choices.items():
-            vote_count = len([item for row in votes.values() for item in row if item == choice[0]])
-
-            iteration = iteration + 1
-
-            self.add_item(PollButton(choice, poll_id, vote_count, iteration))
+            self.add_item(PollButton(choice, poll_id, vote_counts.get(choice[0], 0)))
 
         return self
 
-    def deactivate_buttons_from_collection(self, choices: dict[str, str], votes: dict[str, list]) -> PollView:
+    def deactivate_buttons_from_collection(self, choices: dict[str, str], vote_counts: Mapping[str, int]) -> PollView:
         """Populates the view with deactivated buttons. Returns itself for daisy chaining."""
 
         for choice in choices.items():
-            vote_count = len([item for row in votes.values() for item in row if item == choice[0]])
-
-            self.add_item(InactivePollButton(choice, vote_count))
+            self.add_item(InactivePollButton(choice, vote_counts.get(choice[0], 0)))
 
         return self
 
@@ -60,7 +67,6 @@ class PollButton(discord.ui.Button):
         choice: tuple[str, str],
         poll_id: str,
         vote_count: int = 0,
-        iteration: int = 0,
     ) -> None:
         choice_id, choice_text = choice
 
@@ -68,9 +74,15 @@ class PollButton(discord.ui.Button):
             style=discord.ButtonStyle.primary,
             label=f"[{vote_count}] {choice_text}",
             emoji=emoji_from_asciilo(choice_id),
-            custom_id=f"moevius:poll:{poll_id}:choice:{choice_id}:iteration:{iteration}",
+            custom_id=f"{POLL_NAMESPACE}:{poll_id}:choice:{choice_id}",
         )
 
+    async def callback(self, interaction: discord.Interaction) -> None:
+        if not isinstance(self.view, PollView) or self.view.handler is None or self.custom_id is None:
+            return
+
+        await self.view.handler(interaction, self.custom_id.removeprefix(f"{POLL_NAMESPACE}:"))
+
 
 class InactivePollButton(discord.ui.Button):
     """Represents special discord buttons that are used in polls. Inactive by design."""